@@ -0,0 +1,145 @@
+# Пакетный режим: команды читаются из файла или stdin и выполняются тем же
+# Navigator, что и в интерактивном режиме, но без логотипа и справки.
+# На каждую команду выводится одна строка JSON (JSON Lines) с результатом и временем.
+#
+# Запуск:
+#   python batch.py commands.txt > results.jsonl
+#   printf 'search ace\n1\n' | python batch.py
+
+import argparse
+import json
+import sys
+import time
+
+from repository import Repository
+from logwriter import LogWriter
+from main import Navigator, top_commands_counter
+from snapshot import catalog_factory
+from schema import ensure_schema
+
+class JsonView:
+    """
+    Замена модуля views: вместо печати собирает вывод команды в словарь record.
+    """
+    def __init__(self):
+        self.record = {}
+
+    def reset(self):
+        self.record = {}
+
+    def show_welcome(self):
+        pass
+
+    def show_help(self):
+        self.record["help"] = True
+
+    def show_error(self, message):
+        self.record["error"] = message
+
+    def show_breadcrumb(self, breadcrumb):
+        self.record["breadcrumb"] = breadcrumb
+
+    def show_categories(self, categories):
+        self.record["categories"] = [category.to_dict() for category in categories]
+
+    def show_top_actors(self, actors):
+        self.record["top_actors"] = [actor.to_dict() for actor in actors]
+
+    def show_actors_list(self, actors, page_info=None):
+        self.record["actors"] = [actor.to_dict() for actor in actors]
+
+    def show_search_results(self, films, page_info=None, section="поиск"):
+        self.record["section"] = section
+        self.record["films"] = [film.to_dict() for film in films]
+
+    def show_film_details(self, film, actors):
+        self.record["film"] = film.to_dict()
+        self.record["actors"] = [actor.to_dict() for actor in actors]
+
+    def show_top_queries(self, queries, page_info=None, period=None):
+        self.record["period"] = period
+        self.record["top"] = [{"text": text, "count": count} for text, count in queries]
+
+    def show_query_stats(self, entries, limit=15):
+        self.record["query_stats"] = entries[:limit]
+
+    def show_cache_stats(self, stats):
+        self.record["cache_stats"] = stats
+
+    def show_log_stats(self, stats):
+        self.record["log_stats"] = stats
+
+    def show_exit_message(self):
+        pass
+
+def run_command(navigator, view, cmd):
+    """
+    Выполняет одну команду и возвращает (запись для JSON, продолжать ли работу).
+    Исключение команды попадает в поле error и не прерывает работу.
+    """
+    view.reset()
+    start = time.perf_counter()
+    try:
+        keep_going = navigator.handle(cmd)
+    except Exception as e:
+        view.record["error"] = f"{type(e).__name__}: {e}"
+        keep_going = True
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    record = {"command": cmd, "ms": round(elapsed_ms, 3), "context": navigator.current_context}
+    if navigator.paginator is not None:
+        record.update(page=navigator.paginator.page, total_pages=navigator.paginator.total_pages,
+                      total=navigator.paginator.total)
+    record.update(view.record)
+    return record, keep_going
+
+def to_json(record):
+    """
+    Сериализует запись в одну строку JSON.
+    """
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+def run_batch(lines, out, navigator):
+    """
+    Выполняет команды из lines через navigator (с JsonView) и пишет в out по строке JSON на команду.
+    Пустые строки и строки, начинающиеся с #, пропускаются.
+    Возвращает количество выполненных команд.
+    """
+    view = navigator.view
+    executed = 0
+    for line in lines:
+        cmd = line.strip()
+        if not cmd or cmd.startswith("#"):
+            continue
+        record, keep_going = run_command(navigator, view, cmd)
+        out.write(to_json(record) + "\n")
+        executed += 1
+        if not keep_going:
+            break
+    return executed
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное выполнение команд ReelDeal (вывод — JSON Lines)")
+    parser.add_argument("file", nargs="?", default="-", help="файл с командами (по умолчанию stdin)")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    try:
+        ensure_schema()
+        try:
+            catalog = catalog_factory()
+        except RuntimeError as e:
+            sys.stdout.write(to_json({"error": str(e)}) + "\n")
+            raise SystemExit(1)
+        log_writer = LogWriter().start()
+        navigator = Navigator(Repository(), log_writer, top_commands_counter(), view=JsonView(),
+                              session_factory=catalog)
+        try:
+            run_batch(source, sys.stdout, navigator)
+        finally:
+            log_writer.close()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# Бенчмарк ReelDeal без сервера MySQL.
+# Генерирует базу в форме Sakila в локальном файле SQLite (масштаб 1×/10×/100×),
+# прогоняет сценарии команд через Navigator (обработка команд из main.py)
+# и отдельные методы Repository, печатает по каждой команде p50/p95 задержки,
+# количество прочитанных строк и пик памяти.
+#
+# Запуск:
+#   python bench.py --scale 10 --repeat 20
+#   python bench.py --script commands.txt       # свой сценарий, по команде в строке
+#   python bench.py --json result.json          # сохранить результат
+#   python bench.py --compare baseline.json     # код выхода 1, если p95 вырос
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from repository import Repository
+from filters import FilmFilter
+from logwriter import LogWriter
+from stats import TopCounter
+from pagination import PAGE_SIZE
+from views import show_cache_stats
+from main import Navigator
+from schema import migrate
+from prefetch import Prefetcher
+from sqlite_db import connect, session_factory
+from snapshot import CATALOG_SCHEMA
+
+FIXTURE_VERSION = 1  # Увеличивать при изменении формы сгенерированных данных
+BASE_FILMS = 1000  # Размер Sakila при масштабе 1
+BASE_ACTORS = 200
+CATEGORIES = [
+    "Action", "Animation", "Children", "Classics", "Comedy", "Documentary", "Drama", "Family",
+    "Foreign", "Games", "Horror", "Music", "New", "Sci-Fi", "Sports", "Travel",
+]
+TITLE_WORDS = [
+    "ACADEMY", "DINOSAUR", "ACE", "GOLDFINGER", "ADAPTATION", "HOLES", "AFFAIR", "PREJUDICE",
+    "AFRICAN", "EGG", "AGENT", "TRUMAN", "AIRPLANE", "SIERRA", "AIRPORT", "POLLOCK", "ALABAMA",
+    "DEVIL", "ALADDIN", "CALENDAR", "ALAMO", "VIDEOTAPE", "ALASKA", "PHANTOM", "ALI", "FOREVER",
+    "ALIEN", "CENTER", "ALLEY", "EVOLUTION", "ALONE", "TRIP", "ALTER", "VICTORY", "AMADEUS",
+    "HOLY", "AMELIE", "HELLFIGHTERS", "AMERICAN", "CIRCUS", "AMISTAD", "MIDSUMMER", "ANACONDA",
+    "CONFESSIONS", "ANALYZE", "HOOSIERS", "ANGELS", "LIFE", "ANNIE", "IDENTITY", "ANONYMOUS",
+    "HUMAN", "ANTHEM", "LUKE", "ANTITRUST", "TOMATOES", "ANYTHING", "SAVANNAH", "APACHE", "DIVINE",
+    "APOCALYPSE", "FLAMINGOS", "APOLLO", "TEEN", "ARABIA", "DOGMA", "ARACHNOPHOBIA", "ROLLERCOASTER",
+    "ARGONAUTS", "TOWN", "ARIZONA", "BANG", "ARK", "RIDGEMONT", "ARMAGEDDON", "LOST", "MATRIX",
+]
+DESCRIPTION_PARTS = (
+    ["Epic", "Astounding", "Fateful", "Thoughtful", "Beautiful", "Boring", "Insightful", "Taut"],
+    ["Drama", "Story", "Saga", "Documentary", "Panorama", "Reflection", "Yarn", "Character Study"],
+    ["Feminist", "Moose", "Dentist", "Explorer", "Crocodile", "Squirrel", "Robot", "Car", "Monkey"],
+    ["Chase", "Defeat", "Outrace", "Sink", "Battle", "Meet", "Find", "Pursue", "Vanquish"],
+    ["Canadian Rockies", "Gulf of Mexico", "Ancient India", "Monastery", "Shark Tank",
+     "Abandoned Mine Shaft", "Nigeria", "Berlin", "Baloon Factory", "Manhattan Penthouse"],
+)
+FIRST_NAMES = [
+    "PENELOPE", "NICK", "ED", "JENNIFER", "JOHNNY", "BETTE", "GRACE", "MATTHEW", "JOE", "CHRISTIAN",
+    "ZERO", "KARL", "UMA", "VIVIEN", "CUBA", "FRED", "HELEN", "DAN", "BOB", "LUCILLE", "KIRK",
+    "SANDRA", "JULIA", "SUSAN", "WOODY", "ALEC", "SISSY", "TIM", "MILLA", "AUDREY", "JUDY",
+]
+LAST_NAMES = [
+    "GUINESS", "WAHLBERG", "CHASE", "DAVIS", "LOLLOBRIGIDA", "NICHOLSON", "MOSTEL", "JOHANSSON",
+    "SWANK", "GABLE", "CAGE", "BERRY", "WOOD", "BERGEN", "OLIVIER", "COSTNER", "VOIGHT", "TORN",
+    "FAWCETT", "TRACY", "PALTROW", "MARX", "KILMER", "STREEP", "BLOOM", "CRAWFORD", "DEPP",
+]
+
+# Сценарии по умолчанию: последовательности команд, как их вводит пользователь
+SCENARIOS = {
+    "browse": ["categories", "1", "next", "next", "prev", "3", "back", "back", "Comedy", "2", "home"],
+    "search": ["search ace", "next", "1", "1", "back", "back", "search -d monkey", "next", "home"],
+    "filter": ["filter Action _ 2006", "next", "filter _ DAVIS _", "filter Comedy,Drama _ 2004-2008",
+               "1", "home"],
+    "actors": ["actors", "next", "2", "1", "back", "back", "home"],
+    "misc": ["random", "random 5", "top_queries", "top_queries week", "academy", "davis", "home"],
+}
+
+# Вызовы Repository в обход обработки команд: метка -> функция(repo)
+REPOSITORY_CALLS = {
+    "repo.search_films": lambda repo: repo.search_films("ace", limit=PAGE_SIZE),
+    "repo.count_search_films": lambda repo: repo.count_search_films("ace"),
+    "repo.filter_films": lambda repo: repo.filter_films(
+        FilmFilter.parse("Action", "DAVIS", "2004-2008"), limit=PAGE_SIZE),
+    "repo.get_films_by_category": lambda repo: repo.get_films_by_category(1, limit=PAGE_SIZE),
+    "repo.get_all_actors": lambda repo: repo.get_all_actors(limit=PAGE_SIZE),
+    "repo.get_top_actors": lambda repo: repo.get_top_actors(),
+    "repo.get_actors_by_film_id": lambda repo: repo.get_actors_by_film_id(1),
+    "repo.get_actors_for_films": lambda repo: repo.get_actors_for_films(range(1, PAGE_SIZE + 1)),
+    "repo.get_random_film": lambda repo: repo.get_random_film(),
+    "repo.get_top_commands": lambda repo: repo.get_top_commands(),
+}
+
+# Проверка ключей кэша: фильтры (жанр, актёр, год), которые не должны делить записи кэша.
+# Ненайденный жанр или актёр раньше давал тот же ключ, что и фильтр без условий.
+CACHE_CHECK_FILTERS = [
+    (None, None, None), ("Nope", None, None), (None, "zzz", None), ("Nope", None, "2006"),
+    ("Action", None, None), ("Action", "DAVIS", "2004-2008"), (None, None, None),
+]
+
+KNOWN_COMMANDS = {
+    'next', 'prev', 'back', 'home', 'help', 'exit', 'categories', 'actors', 'top_queries',
+    'random', 'search', 'filter', 'query_stats',
+}
+
+# --- Данные ---
+def build_fixture(path, scale, seed=2006):
+    """
+    Создаёт в файле SQLite таблицы каталога Sakila (схема как у снимка, см. snapshot.py)
+    и заполняет их сгенерированными данными: scale × 1000 фильмов, scale × 200 актёров.
+    """
+    rnd = random.Random(seed)
+    conn = connect(path)
+    conn.executescript(CATALOG_SCHEMA)
+    films, actors = BASE_FILMS * scale, BASE_ACTORS * scale
+    conn.executemany("INSERT INTO category (category_id, name) VALUES (?, ?)",
+                     list(enumerate(CATEGORIES, start=1)))
+    conn.executemany(
+        "INSERT INTO film (film_id, title, description, release_year) VALUES (?, ?, ?, ?)",
+        ((film_id, f"{rnd.choice(TITLE_WORDS)} {rnd.choice(TITLE_WORDS)}",
+          "A {} {} of a {} And a {} who must {} a {} in {}".format(
+              rnd.choice(DESCRIPTION_PARTS[0]), rnd.choice(DESCRIPTION_PARTS[1]),
+              rnd.choice(DESCRIPTION_PARTS[2]), rnd.choice(DESCRIPTION_PARTS[2]),
+              rnd.choice(DESCRIPTION_PARTS[3]), rnd.choice(DESCRIPTION_PARTS[2]),
+              rnd.choice(DESCRIPTION_PARTS[4])),
+          rnd.randint(2000, 2010))
+         for film_id in range(1, films + 1)))
+    conn.executemany("INSERT INTO actor (actor_id, first_name, last_name) VALUES (?, ?, ?)",
+                     ((actor_id, rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES))
+                      for actor_id in range(1, actors + 1)))
+    conn.executemany("INSERT INTO film_category (film_id, category_id) VALUES (?, ?)",
+                     ((film_id, rnd.randint(1, len(CATEGORIES))) for film_id in range(1, films + 1)))
+    conn.executemany("INSERT INTO film_actor (actor_id, film_id) VALUES (?, ?)",
+                     ((actor_id, film_id) for film_id in range(1, films + 1)
+                      for actor_id in rnd.sample(range(1, actors + 1), rnd.randint(1, 10))))
+    conn.commit()
+    conn.close()
+
+def fixture_path(scale, directory=None):
+    """
+    Возвращает путь к файлу с данными масштаба scale, создавая его при первом запуске.
+    """
+    directory = directory or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"reeldeal_bench_v{FIXTURE_VERSION}_x{scale}.sqlite")
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        build_fixture(tmp_path, scale)
+        os.replace(tmp_path, path)
+    return path
+
+# --- Замеры ---
+def command_label(cmd, context):
+    """
+    Группирует команды для отчёта: по первому слову, выбор по номеру — с учётом экрана.
+    """
+    word = cmd.split()[0]
+    if word.isdigit():
+        return f"<номер> ({context})"
+    return word if word in KNOWN_COMMANDS else "<текст>"
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def reset_memory_peak():
+    """
+    Сбрасывает пик tracemalloc перед замером. tracemalloc.reset_peak есть только
+    с Python 3.9; в 3.8 трассировка перезапускается (пик считается от нового нуля).
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+def run_commands(session, commands, repeat, measure_memory=False, prefetch=False):
+    """
+    Прогоняет команды через Navigator repeat раз (каждый раз — новая сессия).
+    prefetch=True включает фоновую подгрузку (строки, прочитанные в фоне, не учитываются).
+    Возвращает {метка: [(секунды, строки, пик памяти в байтах)]}.
+    """
+    samples = defaultdict(list)
+    log_writer = LogWriter(session_factory=session).start()
+    prefetcher = Prefetcher(session_factory=session) if prefetch else None
+    sink = io.StringIO()
+    try:
+        for _ in range(repeat):
+            with session() as cursor:
+                repo = Repository(cursor)
+                navigator = Navigator(repo, log_writer, TopCounter(repo.get_top_commands),
+                                      prefetcher=prefetcher)
+                for cmd in commands:
+                    label = command_label(cmd, navigator.current_context)
+                    rows_before = cursor.rows_fetched
+                    if measure_memory:
+                        reset_memory_peak()
+                        memory_before = tracemalloc.get_traced_memory()[0]
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(sink):
+                        navigator.handle(cmd)
+                    elapsed = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1] - memory_before if measure_memory else 0
+                    samples[label].append((elapsed, cursor.rows_fetched - rows_before, peak))
+                    sink.seek(0)
+                    sink.truncate()
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+        log_writer.close()
+    return samples
+
+def run_repository_calls(session, repeat, measure_memory=False):
+    """
+    Вызывает методы из REPOSITORY_CALLS repeat раз. Формат результата — как у run_commands.
+    """
+    samples = defaultdict(list)
+    with session() as cursor:
+        repo = Repository(cursor)
+        for _ in range(repeat):
+            for label, call in REPOSITORY_CALLS.items():
+                rows_before = cursor.rows_fetched
+                if measure_memory:
+                    reset_memory_peak()
+                    memory_before = tracemalloc.get_traced_memory()[0]
+                start = time.perf_counter()
+                call(repo)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] - memory_before if measure_memory else 0
+                samples[label].append((elapsed, cursor.rows_fetched - rows_before, peak))
+    return samples
+
+def check_filter_cache(session):
+    """
+    Прогоняет CACHE_CHECK_FILTERS с включённым кэшем (в прямом и обратном порядке)
+    и сравнивает с результатами без кэша. Возвращает список расхождений.
+    """
+    cache = Repository.result_cache
+    enabled = cache.enabled
+    mismatches = []
+    try:
+        with session() as cursor:
+            repo = Repository(cursor)
+            cache.enabled = False
+            expected = {args: (repo.count_filter_films(FilmFilter.parse(*args)),
+                               [film.film_id for film in repo.filter_films(FilmFilter.parse(*args),
+                                                                           limit=PAGE_SIZE)])
+                        for args in CACHE_CHECK_FILTERS}
+            cache.enabled = True
+            for order in (CACHE_CHECK_FILTERS, CACHE_CHECK_FILTERS[::-1]):
+                cache.clear()
+                for args in order:
+                    film_filter = FilmFilter.parse(*args)
+                    total = repo.count_filter_films(film_filter)
+                    page = [film.film_id for film in repo.filter_films(film_filter, limit=PAGE_SIZE)]
+                    if (total, page) != expected[args]:
+                        mismatches.append(args)
+    finally:
+        cache.clear()
+        cache.reset_stats()
+        cache.enabled = enabled
+    return mismatches
+
+def summarize(timing, memory):
+    """
+    Сводит замеры в {метка: {n, p50_ms, p95_ms, rows, peak_kib}}.
+    Задержки берутся из прогона без tracemalloc, пик памяти — из отдельного прогона с ним.
+    """
+    result = {}
+    for label, values in timing.items():
+        durations = [elapsed * 1000 for elapsed, _, _ in values]
+        result[label] = {
+            "n": len(values),
+            "p50_ms": round(percentile(durations, 0.5), 3),
+            "p95_ms": round(percentile(durations, 0.95), 3),
+            "rows": round(sum(rows for _, rows, _ in values) / len(values), 1),
+            "peak_kib": round(max((peak for _, _, peak in memory.get(label, [])), default=0) / 1024, 1),
+        }
+    return result
+
+def print_report(results):
+    print(f"{'команда':<28} {'n':>5} {'p50, мс':>9} {'p95, мс':>9} {'строк':>8} {'пик, КиБ':>10}")
+    for label, row in sorted(results.items()):
+        print(f"{label:<28} {row['n']:>5} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['rows']:>8} {row['peak_kib']:>10}")
+
+def compare(results, baseline, tolerance, noise_ms):
+    """
+    Возвращает список регрессий: команды, у которых p95 вырос больше чем на tolerance
+    (и больше чем на noise_ms миллисекунд) относительно baseline.
+    """
+    regressions = []
+    for label, before in baseline.items():
+        after = results.get(label)
+        if after is None:
+            continue
+        limit = before["p95_ms"] * (1 + tolerance)
+        if after["p95_ms"] > limit and after["p95_ms"] - before["p95_ms"] > noise_ms:
+            regressions.append((label, before["p95_ms"], after["p95_ms"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк команд ReelDeal на локальной базе SQLite")
+    parser.add_argument("--scale", type=int, default=1, help="масштаб данных (1 = размер Sakila)")
+    parser.add_argument("--repeat", type=int, default=10, help="сколько раз прогнать сценарии")
+    parser.add_argument("--script", help="файл со сценарием (по команде в строке)")
+    parser.add_argument("--data-dir", help="где хранить сгенерированные базы (по умолчанию tmp)")
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пик памяти")
+    parser.add_argument("--prefetch", action="store_true", help="включить фоновую подгрузку страниц и актёров")
+    parser.add_argument("--cache", action="store_true", help="включить кэш результатов (повторы станут попаданиями)")
+    parser.add_argument("--json", help="сохранить результат в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для проверки регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимый рост p95 (доля)")
+    parser.add_argument("--noise-ms", type=float, default=1.0, help="рост p95 меньше этого не считается")
+    args = parser.parse_args()
+
+    # Без --cache замеряются запросы к БД, а не попадания в кэш
+    Repository.result_cache.enabled = args.cache
+    path = fixture_path(args.scale, args.data_dir)
+    session = session_factory(path)
+    with session() as cursor:
+        migrate(Repository(cursor))
+
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            scenarios = {"script": [line.strip() for line in f if line.strip()]}
+    else:
+        scenarios = SCENARIOS
+    commands = [cmd for scenario in scenarios.values() for cmd in scenario]
+
+    if args.cache:
+        mismatches = check_filter_cache(session)
+        for genre, actor, year in mismatches:
+            print(f"Кэш: filter {genre or '_'} {actor or '_'} {year or '_'} отличается от результата без кэша")
+        if mismatches:
+            raise SystemExit(1)
+
+    timing = run_commands(session, commands, args.repeat, prefetch=args.prefetch)
+    timing.update(run_repository_calls(session, args.repeat))
+    memory = {}
+    if not args.no_memory:
+        tracemalloc.start()
+        memory = run_commands(session, commands, 1, measure_memory=True)
+        memory.update(run_repository_calls(session, 1, measure_memory=True))
+        tracemalloc.stop()
+
+    results = summarize(timing, memory)
+    print(f"Масштаб {args.scale}×, повторов {args.repeat}, база {path}")
+    print_report(results)
+    if args.cache:
+        show_cache_stats(Repository.result_cache.stats())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"scale": args.scale, "results": results}, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.noise_ms)
+        for label, before, after in regressions:
+            print(f"Регрессия: {label}: p95 {before:.3f} → {after:.3f} мс")
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
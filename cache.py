@@ -0,0 +1,157 @@
+# Кэш результатов запросов каталога (списки фильмов и их количества).
+# Одни и те же поиски и категории запрашиваются постоянно (см. top_queries), поэтому
+# результаты методов Repository, помеченных @cached, хранятся в памяти процесса
+# (в сетевом режиме — общей для всех клиентов). Ключ — имя метода и нормализованные
+# аргументы. Старые записи вытесняются по LRU, когда в кэше больше RESULT_CACHE_ROWS
+# строк, и по времени жизни RESULT_CACHE_TTL. Не чаще раза в
+# RESULT_CACHE_CHECK_INTERVAL секунд проверяется версия каталога
+# (last_update и количество строк таблиц, см. snapshot.catalog_version):
+# если каталог изменился, кэш очищается. Счётчики попаданий и промахов
+# выводятся командой query_stats.
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from models import Film
+from config import RESULT_CACHE_ENABLED, RESULT_CACHE_ROWS, RESULT_CACHE_TTL, RESULT_CACHE_CHECK_INTERVAL
+
+class ResultCache:
+    """
+    LRU-кэш результатов с ограничением по количеству строк.
+    Аргументы конструктора:
+        max_rows: int — сколько строк результатов (фильмов) хранить всего
+        ttl: float — время жизни записи в секундах
+        check_interval: float — как часто проверять версию каталога, сек
+        enabled: bool — выключенный кэш всегда промахивается и ничего не хранит
+    """
+    def __init__(self, max_rows=RESULT_CACHE_ROWS, ttl=RESULT_CACHE_TTL,
+                 check_interval=RESULT_CACHE_CHECK_INTERVAL, enabled=RESULT_CACHE_ENABLED):
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.enabled = enabled
+        self.version = None  # Версия каталога, для которой действуют записи
+        self.checked_at = None
+        self.rows = 0
+        self._entries = OrderedDict()  # ключ -> (время записи, результат, строк)
+        self._lock = threading.Lock()  # Кэш общий для всех сессий сервера
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def needs_check(self):
+        """
+        Пора ли проверить версию каталога.
+        """
+        return self.checked_at is None or time.monotonic() - self.checked_at > self.check_interval
+
+    def set_version(self, version):
+        """
+        Запоминает версию каталога; если она изменилась, очищает кэш.
+        """
+        with self._lock:
+            if self.version is not None and version != self.version:
+                self.invalidations += 1
+                self._entries.clear()
+                self.rows = 0
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def get(self, key):
+        """
+        Возвращает (найдено ли, результат).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, result):
+        """
+        Сохраняет результат; вытесняет давно не использованные записи сверх max_rows.
+        """
+        rows = len(result) if isinstance(result, list) else 1
+        if rows > self.max_rows:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), result, rows)
+            self.rows += rows
+            while self.rows > self.max_rows:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, rows = self._entries.pop(key)
+        self.rows -= rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.rows = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        """
+        Возвращает счётчики кэша: попадания, промахи, доля попаданий, вытеснения,
+        сбросы по версии каталога, записей и строк в кэше.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "rows": self.rows,
+                "max_rows": self.max_rows,
+            }
+
+def cache_key(value):
+    """
+    Нормализует аргумент метода для ключа кэша: регистр и лишние пробелы
+    в строках не различаются (поиск в каталоге от них не зависит), фильм
+    (after) заменяется его ключом сортировки, фильтр — его cache_key().
+    """
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, Film):
+        return ("film", value.title, value.film_id)
+    if hasattr(value, "cache_key"):
+        return value.cache_key()
+    return value
+
+def cached(method):
+    """
+    Декоратор метода Repository: результат берётся из self.result_cache,
+    если там есть запись для тех же аргументов и текущей версии каталога.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.result_cache
+        if not cache.enabled:
+            return method(self, *args, **kwargs)
+        if cache.needs_check():
+            cache.set_version(self.get_catalog_version())
+        key = (method.__name__, tuple(cache_key(arg) for arg in args),
+               tuple(sorted((name, cache_key(arg)) for name, arg in kwargs.items())))
+        found, result = cache.get(key)
+        if not found:
+            result = method(self, *args, **kwargs)
+            cache.put(key, result)
+        return list(result) if isinstance(result, list) else result
+    return wrapper
@@ -1,14 +1,77 @@
-# Используется модулем db.py для создания соединения с MySQL.
+# Используется модулем db.py для создания соединения с БД.
 import os
-from dotenv import load_dotenv
-
-# Загружаем переменные из .env
-load_dotenv()
-
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "port": int(os.getenv("DB_PORT")),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "database": os.getenv("DB_NAME"),
-}
+
+# Загружаем переменные из .env, если он есть. python-dotenv импортируется только
+# в этом случае: при запуске из скриптов с переменными окружения он не нужен,
+# а его импорт заметно удлиняет старт.
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(ENV_FILE) or os.path.exists(".env"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Хранилище: "mysql" (по умолчанию) или "sqlite" — встроенная база в файле DB_PATH
+# (например, локальная копия каталога или база для тестов производительности без MySQL)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+if DB_BACKEND == "sqlite":
+    DB_CONFIG = {
+        "backend": "sqlite",
+        "path": os.getenv("DB_PATH", "reeldeal.sqlite"),
+    }
+else:
+    DB_CONFIG = {
+        "backend": "mysql",
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 3306)),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME"),
+    }
+
+# Пул соединений (db.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Максимум открытых соединений
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # Ожидание свободного соединения, сек
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", 30))  # Проверять соединение, простоявшее дольше, сек
+
+# Буферизованная запись логов (logwriter.py)
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 50))  # Сбрасывать, когда накопилось столько записей
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 2))  # ...или прошло столько секунд
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # При переполнении новые записи отбрасываются
+
+# Версия схемы БД (schema.py): проверенная версия запоминается в этом файле,
+# чтобы не обращаться к БД при каждом запуске. Пустое значение — проверять всегда.
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", ".reeldeal_schema.json")
+
+# Обслуживание логов (maintenance.py)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", 90))  # Хранить сырые логи столько дней
+LOG_PURGE_BATCH = int(os.getenv("LOG_PURGE_BATCH", 5000))  # Удалять по столько id за транзакцию
+
+# Инструментирование запросов (instrumentation.py)
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "1") == "1"  # Замерять запросы Repository
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))  # Порог медленного запроса, мс
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")  # Журнал медленных запросов (пусто — не писать)
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"  # Добавлять EXPLAIN в журнал
+QUERY_STATS_FILE = os.getenv("QUERY_STATS_FILE", "")  # Куда сохранить сводку при выходе (JSON)
+
+# Фоновая подгрузка следующей страницы и составов актёров (prefetch.py)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 1))  # Потоков (и соединений) для фоновых запросов
+
+# Кэш результатов запросов каталога (cache.py)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_ROWS = int(os.getenv("RESULT_CACHE_ROWS", 20000))  # Сколько строк (фильмов) хранить всего
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 600))  # Время жизни записи, сек
+RESULT_CACHE_CHECK_INTERVAL = float(os.getenv("RESULT_CACHE_CHECK_INTERVAL", 30))  # Проверять версию каталога, сек
+
+# Сетевой режим (server.py)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8765))
+SERVER_MAX_CLIENTS = int(os.getenv("SERVER_MAX_CLIENTS", 500))  # Сверх лимита подключения отклоняются
+SERVER_IDLE_TIMEOUT = float(os.getenv("SERVER_IDLE_TIMEOUT", 600))  # Отключать клиента после простоя, сек
+# Потоков для команд (каждый держит одно соединение на время команды); остальные соединения
+# пула — журналу (1), перечитыванию топа команд (1, один поток за раз, см. stats.TopCounter)
+# и фоновой подгрузке
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", max(1, DB_POOL_SIZE - 2 - PREFETCH_WORKERS)))
+
+# Снимок каталога и режим только для чтения (snapshot.py)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "catalog_snapshot.sqlite")  # Файл снимка (SQLite)
+READ_ONLY = os.getenv("READ_ONLY", "0") == "1"  # Читать каталог из снимка, в MySQL писать только логи
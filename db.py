@@ -1,29 +1,193 @@
-# Контекстный менеджер для работы с базой данных.
-# Обеспечивает единое соединение и транзакцию на сессию.
+# Пул соединений и контекстный менеджер для работы с базой данных.
+# Соединения открываются один раз и переиспользуются всеми вызовами db_session(),
+# поэтому повторная сессия не платит за TCP-подключение и авторизацию.
+# Хранилище выбирается по DB_CONFIG["backend"]: MySQL (MySQLBackend) или
+# встроенный файл SQLite (sqlite_db.SQLiteBackend). Repository пишет SQL
+# в диалекте MySQL, курсор SQLite переводит его сам.
 # Используется в main.py для всех операций с БД.
 
-import mysql.connector
+import queue
+import threading
+import time
 from contextlib import contextmanager
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_PING_INTERVAL
+
+class MySQLBackend:
+    """
+    Хранилище MySQL (mysql.connector).
+    Аргументы конструктора:
+        config: dict — DB_CONFIG (host, port, user, password, database)
+    """
+    name = "mysql"
+
+    def __init__(self, config):
+        import mysql.connector  # Не нужен, если выбрано хранилище SQLite
+        self._connector = mysql.connector
+        self.Error = mysql.connector.Error
+        self.config = {key: value for key, value in config.items() if key != "backend"}
+
+    def connect(self):
+        return self._connector.connect(**self.config)
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def begin_read_only(self, conn):
+        conn.start_transaction(consistent_snapshot=True, readonly=True)
+
+    def ping(self, conn):
+        """
+        Проверяет соединение (с переподключением). Вызывает self.Error, если оно разорвано.
+        """
+        conn.ping(reconnect=True, attempts=2, delay=0)
+
+def read_session():
+    """
+    db_session для чтения каталога: короткая транзакция только для чтения.
+    """
+    return db_session(read_only=True)
+
+def get_backend(config):
+    """
+    Возвращает хранилище по config["backend"] ("mysql" или "sqlite").
+    """
+    backend = config.get("backend", "mysql")
+    if backend == "sqlite":
+        from sqlite_db import SQLiteBackend
+        return SQLiteBackend(config)
+    if backend == "mysql":
+        return MySQLBackend(config)
+    raise ValueError(f"Неизвестное хранилище: {backend}")
+
+class ConnectionPool:
+    """
+    Пул соединений с БД.
+    Аргументы конструктора:
+        config: dict — DB_CONFIG (хранилище и параметры подключения, см. get_backend)
+        size: int — максимальное количество открытых соединений
+        timeout: float — сколько секунд ждать свободное соединение
+        ping_interval: float — соединение, простоявшее в пуле дольше, проверяется ping
+            (с переподключением) перед выдачей
+    """
+    def __init__(self, config, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 ping_interval=DB_POOL_PING_INTERVAL):
+        self.config = config
+        self.backend = get_backend(config)
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()  # (соединение, время возврата в пул)
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        try:
+            return self.backend.connect()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def acquire(self):
+        """
+        Выдаёт соединение из пула; открывает новое, если лимит не исчерпан.
+        Долго простоявшее соединение проверяется и при необходимости переподключается.
+        """
+        try:
+            conn, released_at = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                return self._connect()
+            try:
+                conn, released_at = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError("Нет свободных соединений с БД") from None
+        if time.monotonic() - released_at > self.ping_interval:
+            try:
+                self.backend.ping(conn)
+            except self.backend.Error:
+                self.discard(conn)
+                with self._lock:
+                    self._opened += 1
+                return self._connect()
+        return conn
+
+    def release(self, conn):
+        """
+        Возвращает соединение в пул.
+        """
+        self._idle.put((conn, time.monotonic()))
+
+    def discard(self, conn):
+        """
+        Закрывает неисправное соединение и освобождает место в пуле.
+        """
+        with self._lock:
+            self._opened -= 1
+        try:
+            conn.close()
+        except self.backend.Error:
+            pass
+
+    def close(self):
+        """
+        Закрывает все свободные соединения.
+        """
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Возвращает общий для процесса пул соединений (создаётся при первом обращении).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_CONFIG)
+        return _pool
 
 @contextmanager
-def db_session():
+def db_session(read_only=False):
     """
-    Контекстный менеджер для работы с MySQL.
-    - Открывает соединение и курсор.
+    Контекстный менеджер для работы с БД.
+    - Берёт соединение из пула и открывает курсор.
+    - read_only=True начинает транзакцию только для чтения с согласованным снимком
+      (все запросы одной команды видят одни и те же данные).
     - Передаёт курсор в вызывающий код.
     - Автоматически коммитит транзакцию после успешной работы.
     - В случае ошибки откатывает изменения (rollback).
-    - Гарантирует закрытие курсора и соединения.
+    - Закрывает курсор и возвращает соединение в пул
+      (разорванное соединение закрывается и не возвращается).
     """
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    pool = get_pool()
+    conn = pool.acquire()
+    cursor = pool.backend.cursor(conn)
+    broken = False
     try:
+        if read_only:
+            pool.backend.begin_read_only(conn)
         yield cursor
         conn.commit()
     except Exception as e:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except pool.backend.Error:
+            broken = True
         raise e
     finally:
         cursor.close()
-        conn.close()
+        if broken:
+            pool.discard(conn)
+        else:
+            pool.release(conn)
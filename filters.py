@@ -0,0 +1,109 @@
+# Условия фильтрации фильмов (команда filter).
+# FilmFilter разбирает аргументы команды: несколько жанров и актёров через запятую,
+# годы и диапазоны годов (2005-2007). Repository.filter_films сначала переводит
+# жанры и актёров в id (по индексированным столбцам), затем строит запрос только
+# с нужными условиями. Найденные id запоминаются в объекте фильтра, поэтому
+# следующие страницы не повторяют этот поиск. id актёров можно задать заранее
+# (поиск по свободному тексту уже нашёл нескольких актёров).
+
+class FilmFilter:
+    """
+    Условия фильтра фильмов.
+    Аргументы конструктора:
+        genres: список подстрок названий жанров (любой из них)
+        actors: список начал имён или фамилий актёров (любой из них)
+        years: список диапазонов (год_с, год_по)
+        actor_ids: id актёров, если они уже известны (тогда actors по БД не ищутся)
+    """
+    def __init__(self, genres=(), actors=(), years=(), actor_ids=None):
+        self.genres = list(genres)
+        self.actors = list(actors)
+        self.years = list(years)
+        self.category_ids = None  # Заполняется Repository при первом запросе
+        self.actor_ids = list(actor_ids) if actor_ids is not None else None
+        self.preset_actor_ids = tuple(sorted(self.actor_ids)) if actor_ids is not None else None
+
+    @staticmethod
+    def _split(value):
+        if not value or value == '_':
+            return []
+        return [part.strip() for part in value.split(',') if part.strip()]
+
+    @classmethod
+    def parse(cls, genre=None, actor=None, year=None):
+        """
+        Создаёт фильтр из аргументов команды filter <жанр> <актёр> <год>.
+        Любой аргумент может быть None или '_'. Год — число или диапазон 2005-2007.
+        Вызывает ValueError, если год указан неверно.
+        """
+        years = []
+        for part in cls._split(year):
+            start, _, end = part.partition('-')
+            start, end = int(start), int(end or start)
+            years.append((min(start, end), max(start, end)))
+        return cls(cls._split(genre), cls._split(actor), years)
+
+    def cache_key(self):
+        """
+        Ключ фильтра для кэша результатов (cache.py). Строится по условиям фильтра
+        и не зависит от того, переведены ли уже жанры и актёры в id; заданные
+        заранее id актёров входят в ключ отдельно.
+        """
+        def names(values):
+            return tuple(sorted(" ".join(value.lower().split()) for value in values))
+        return ("filter", names(self.genres), names(self.actors), tuple(self.years),
+                self.preset_actor_ids)
+
+# --- Уточнение текущего списка в памяти (команда refine) ---
+# Условия применяются к уже загруженному списку фильмов без запросов к БД
+# (кроме составов актёров, которых ещё нет в карте составов сессии).
+REFINE_KINDS = ('genre', 'year', 'title', 'actor', 'sort')
+SORT_KEYS = {  # Значение refine sort -> (ключ сортировки, по убыванию)
+    'title': (lambda film: film.title, False),
+    '-title': (lambda film: film.title, True),
+    'year': (lambda film: (film.year or 0, film.title), False),
+    '-year': (lambda film: (film.year or 0, film.title), True),
+}
+
+def check_refinement(kind, value):
+    """
+    Проверяет условие уточнения. Вызывает ValueError, если оно задано неверно.
+    """
+    if kind not in REFINE_KINDS:
+        raise ValueError(f"Уточнение: {' | '.join(REFINE_KINDS)}")
+    if kind == 'year':
+        try:
+            FilmFilter.parse(year=value)
+        except ValueError:
+            raise ValueError("Год указывается числом или диапазоном, например 2006 или 2005-2007.")
+    elif kind == 'sort' and value not in SORT_KEYS:
+        raise ValueError(f"Сортировка: {' | '.join(SORT_KEYS)}")
+    elif not FilmFilter._split(value):
+        raise ValueError("Укажите значение для уточнения.")
+
+def refine_films(films, kind, value, casts=None):
+    """
+    Возвращает фильмы списка, подходящие под условие (для sort — весь список по порядку).
+    Аргументы:
+        films: список Film
+        kind: str — 'genre', 'year', 'title', 'actor' или 'sort' (см. REFINE_KINDS)
+        value: str — подстроки жанров или имён актёров через запятую, год или диапазон
+            (2005-2007), подстрока названия, ключ сортировки (SORT_KEYS)
+        casts: dict film_id -> список Actor (нужен для 'actor')
+    """
+    if kind == 'sort':
+        key, reverse = SORT_KEYS[value]
+        return sorted(films, key=key, reverse=reverse)
+    if kind == 'year':
+        years = FilmFilter.parse(year=value).years
+        return [film for film in films
+                if film.year is not None and any(start <= int(film.year) <= end for start, end in years)]
+    if kind == 'title':
+        part = value.lower()
+        return [film for film in films if part in film.title.lower()]
+    parts = [part.lower() for part in FilmFilter._split(value)]
+    if kind == 'genre':
+        return [film for film in films
+                if any(part in genre.lower() for genre in film.genre for part in parts)]
+    return [film for film in films
+            if any(part in actor.full_name().lower() for actor in casts.get(film.film_id, ()) for part in parts)]
@@ -0,0 +1,202 @@
+# Инструментирование запросов Repository.
+# InstrumentedCursor оборачивает курсор и для каждого запроса записывает метод Repository,
+# отпечаток SQL (без значений параметров), длительность (выполнение + чтение строк),
+# количество строк и примерный объём прочитанных данных. Запросы медленнее порога
+# пишутся в журнал медленных запросов, если он задан (SLOW_QUERY_LOG; по желанию — вместе с EXPLAIN).
+# Сводка доступна командой query_stats и сохраняется в JSON при выходе (QUERY_STATS_FILE).
+
+import json
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from config import SLOW_QUERY_MS, SLOW_QUERY_LOG, SLOW_QUERY_EXPLAIN
+
+SLOW_LOG_PARAMS = 10  # Сколько параметров запроса писать в журнал медленных запросов
+SLOW_LOG_PARAM_LENGTH = 100  # Длиннее — обрезается
+
+def fingerprint(sql):
+    """
+    Возвращает отпечаток запроса: пробелы схлопнуты, списки IN (...) и литералы заменены.
+    """
+    sql = " ".join(sql.split())
+    sql = re.sub(r"IN \((?:%s, )*%s\)", "IN (...)", sql)
+    sql = re.sub(r"'[^']*'", "?", sql)
+    sql = re.sub(r"\b\d+\b", "?", sql)
+    return sql.replace("%s", "?")
+
+def _row_size(row):
+    """
+    Примерный размер строки результата в байтах.
+    """
+    return sum(len(value) if isinstance(value, (str, bytes)) else 0 if value is None else 8
+               for value in row)
+
+def _caller_method():
+    """
+    Возвращает имя публичного метода Repository, из которого выполняется запрос.
+    """
+    frame = sys._getframe(2)
+    name = None
+    while frame is not None:
+        if frame.f_globals.get("__name__") == "repository":
+            name = frame.f_code.co_name
+            if not name.startswith("_"):
+                return name
+        elif name is not None:
+            break
+        frame = frame.f_back
+    return name or "?"
+
+class QueryStats:
+    """
+    Сводка по запросам: (метод, отпечаток) -> количество, время, строки, байты.
+    Аргументы конструктора:
+        slow_ms: float — порог медленного запроса в миллисекундах
+        slow_log: str — файл журнала медленных запросов (пусто — не писать)
+        explain: bool — добавлять ли в журнал вывод EXPLAIN
+    """
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_QUERY_LOG, explain=SLOW_QUERY_EXPLAIN):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.explain = explain
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, sql, duration, rows, size):
+        """
+        Учитывает выполненный запрос. Возвращает True, если он медленный.
+        """
+        key = (method, fingerprint(sql))
+        duration_ms = duration * 1000
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    "method": method, "sql": key[1], "count": 0, "total_ms": 0.0,
+                    "max_ms": 0.0, "rows": 0, "bytes": 0, "slow": 0,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["rows"] += rows
+            entry["bytes"] += size
+            slow = duration_ms >= self.slow_ms
+            if slow:
+                entry["slow"] += 1
+        return slow
+
+    def log_slow(self, method, sql, params, duration, rows, explain=None):
+        """
+        Дописывает медленный запрос в журнал (одна JSON-строка на запрос):
+        отпечаток SQL и первые SLOW_LOG_PARAMS параметров, чтобы запрос
+        с длинным списком IN (...) не раздувал журнал.
+        """
+        if not self.slow_log:
+            return
+        line = json.dumps({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "method": method,
+            "duration_ms": round(duration * 1000, 3),
+            "rows": rows,
+            "sql": fingerprint(sql),
+            "params": [str(param)[:SLOW_LOG_PARAM_LENGTH] for param in list(params)[:SLOW_LOG_PARAMS]],
+            "params_total": len(params),
+            "explain": explain,
+        }, ensure_ascii=False)
+        with self._lock:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def summary(self):
+        """
+        Возвращает список записей сводки по убыванию суммарного времени.
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def dump(self, path):
+        """
+        Сохраняет сводку в JSON.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+query_stats = QueryStats()  # Общая сводка процесса
+
+class InstrumentedCursor:
+    """
+    Обёртка курсора, замеряющая каждый запрос.
+    Запрос считается завершённым после fetchall() либо перед следующим execute.
+    Аргументы конструктора:
+        cursor: курсор БД
+        stats: QueryStats
+    """
+    def __init__(self, cursor, stats=query_stats):
+        self._cursor = cursor
+        self._stats = stats
+        self._pending = None  # [метод, sql, параметры, начало, время, строки, байты]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        method, sql, params, _, duration, rows, size = pending
+        if self._stats.record(method, sql, duration, rows, size):
+            explain = None
+            if self._stats.explain and sql.lstrip().upper().startswith("SELECT"):
+                try:
+                    self._cursor.execute("EXPLAIN " + sql, params)
+                    explain = [[str(value) for value in row] for row in self._cursor.fetchall()]
+                except Exception as e:
+                    explain = f"EXPLAIN не выполнен: {e}"
+            self._stats.log_slow(method, sql, params, duration, rows, explain)
+
+    def execute(self, sql, params=()):
+        self._finish()
+        start = time.perf_counter()
+        result = self._cursor.execute(sql, params)
+        self._pending = [_caller_method(), sql, params, start, time.perf_counter() - start, 0, 0]
+        return result
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        result = self._cursor.executemany(sql, seq_of_params)
+        self._pending = [_caller_method(), sql, (), start, time.perf_counter() - start, 0, 0]
+        self._finish()
+        return result
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        if self._pending is not None:
+            self._pending[4] += time.perf_counter() - start
+            self._pending[5] += len(rows)
+            self._pending[6] += sum(_row_size(row) for row in rows)
+            self._finish()
+        return rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        if self._pending is not None:
+            self._pending[4] += time.perf_counter() - start
+            if row is not None:
+                self._pending[5] += 1
+                self._pending[6] += _row_size(row)
+        return row
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
@@ -0,0 +1,133 @@
+# Буферизованная асинхронная запись логов команд и поисковых запросов.
+# Записи копятся в очереди в памяти и сбрасываются в БД фоновым потоком
+# пачками (executemany) — по размеру пачки или по таймеру, а также при выходе.
+# Пишет через Repository.log_commands/log_searches. Используется main.py, batch.py и server.py.
+
+import queue
+import threading
+import time
+from datetime import datetime
+from db import db_session
+from repository import Repository
+from config import LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_QUEUE_SIZE
+
+_STOP = object()  # Сигнал фоновому потоку: сбросить остаток и завершиться
+MAX_TEXT_LENGTH = 255  # Ширина столбцов текста в таблицах логов (VARCHAR(255)), длиннее — обрезается
+
+class LogWriter:
+    """
+    Фоновый писатель логов.
+    Аргументы конструктора:
+        session_factory: контекстный менеджер, выдающий курсор (по умолчанию db_session)
+        batch_size: int — сбрасывать, когда накопилось столько записей
+        flush_interval: float — сбрасывать не реже, чем раз в столько секунд
+        queue_size: int — ёмкость очереди; при переполнении новые записи отбрасываются
+            (счётчик dropped), чтобы не блокировать ввод пользователя
+    """
+    def __init__(self, session_factory=db_session, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, queue_size=LOG_QUEUE_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0  # Отброшено из-за переполнения очереди
+        self.failed = 0  # Потеряно из-за ошибок записи в БД
+        self.last_error = None  # Текст последней ошибки записи
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        """
+        Запускает фоновый поток.
+        """
+        self._thread.start()
+        return self
+
+    def log_command(self, command):
+        """
+        Ставит команду пользователя в очередь на запись.
+        """
+        self._put(("command", command, datetime.now()))
+
+    def log_search(self, query):
+        """
+        Ставит поисковый запрос в очередь на запись.
+        """
+        self._put(("search", query, datetime.now()))
+
+    def _put(self, entry):
+        kind, text, at = entry
+        entry = (kind, text[:MAX_TEXT_LENGTH], at)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        """
+        Возвращает счётчики потерь: отброшено при переполнении, не записано из-за ошибок,
+        последняя ошибка и сколько записей ждут в очереди.
+        """
+        return {"dropped": self.dropped, "failed": self.failed,
+                "last_error": self.last_error, "queued": self._queue.qsize()}
+
+    def close(self, timeout=5):
+        """
+        Сбрасывает накопленные записи и останавливает фоновый поток.
+        """
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                entry = None
+            if entry is _STOP:
+                self._flush(batch)
+                return
+            if entry is not None:
+                batch.append(entry)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch):
+        """
+        Записывает записи в БД одной транзакцией.
+        """
+        commands = [(text, at) for kind, text, at in batch if kind == "command"]
+        searches = [(text, at) for kind, text, at in batch if kind == "search"]
+        with self.session_factory() as cursor:
+            repo = Repository(cursor)
+            if commands:
+                repo.log_commands(commands)
+            if searches:
+                repo.log_searches(searches)
+
+    def _flush(self, batch):
+        """
+        Записывает пачку в БД одной транзакцией. Если пачка не записалась,
+        записи пишутся по одной, чтобы одна ошибочная не потянула за собой остальные.
+        """
+        if not batch:
+            return
+        try:
+            self._write(batch)
+            return
+        except Exception as e:
+            self.last_error = str(e)
+        for entry in batch:
+            try:
+                self._write([entry])
+            except Exception as e:
+                self.failed += 1
+                self.last_error = str(e)
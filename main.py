@@ -1,441 +1,645 @@
 # Обработка команд пользователя, навигация, стек возврата, хлебные крошки, пагинация.
 # Вся работа с БД — через Repository, все выводы — через views.py.
 
+import argparse
+
+from schema import SCHEMA_VERSION
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ReelDeal — поиск фильмов в каталоге (интерактивный режим)")
+    parser.add_argument("--version", action="version", version=f"ReelDeal, схема БД v{SCHEMA_VERSION}")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    # --help и --version разбираются до импорта остальных модулей (БД, .env, пулы потоков),
+    # чтобы такие вызовы из скриптов завершались сразу
+    parse_args()
+
+from collections import OrderedDict, deque
+
 from db import db_session
 from repository import Repository
-from views import (
-    show_welcome, show_help, show_error, show_breadcrumb, show_categories,
-    show_top_actors, show_actors_list, show_search_results, show_film_details,
-    show_top_queries, show_exit_message
-)
-from models import Film, Actor, Category
+from logwriter import LogWriter
+from stats import TopCounter, TOP_PERIODS
+from filters import FilmFilter, check_refinement, refine_films
+import views
+from views import show_welcome, show_help
+from instrumentation import query_stats
+from config import QUERY_STATS_FILE
+from pagination import ListPager, KeysetPager, PAGE_SIZE
+from models import Film
+from prefetch import Prefetcher, result_or_none
+from config import PREFETCH_ENABLED, READ_ONLY
+from snapshot import catalog_factory, read_snapshot_info
+from schema import ensure_schema
 
-PAGE_SIZE = 15  # Количество элементов на странице для пагинации
+CAST_MAP_SIZE = 1000  # Сколько составов актёров хранить в сессии
+STACK_DEPTH = 30  # Сколько экранов помнит back (самые старые вытесняются)
+SCREEN_CACHE_SIZE = 3  # Сколько последних экранов держать в памяти целиком
+RANDOM_MAX_FILMS = PAGE_SIZE  # Больше случайных фильмов за раз не выбирается (одна страница)
+REFINE_MAX_ROWS = 2000  # Список длиннее этого не уточняется в памяти (нужен filter/search)
 
-def paginate(items, page, page_size=PAGE_SIZE):
+class Navigator:
     """
-    Вспомогательная функция для постраничного вывода.
-    Возвращает срез списка для текущей страницы и строку с инфо о странице.
+    Навигация одного пользователя: текущий экран, стек возврата (back),
+    хлебные крошки и пагинация. handle() выполняет одну команду.
+    Аргументы конструктора:
+        repo: Repository
+        log_writer: LogWriter — куда писать логи команд и поиска
+        top_commands: TopCounter — топ команд (для top_queries)
+        view: модуль или объект с функциями show_* (по умолчанию views — печать в консоль)
+        prefetcher: Prefetcher или None — фоновая подгрузка следующей страницы и составов актёров
+        session_factory: фабрика курсоров каталога или None. Если задана, каждая команда
+            выполняется в своей короткой транзакции: repo привязывается к новому курсору
+            на время команды. Если None, repo работает на своём курсоре.
     """
-    total = len(items)
-    total_pages = max(1, (total + page_size - 1) // page_size)
-    page = max(1, min(page, total_pages))
-    start = (page - 1) * page_size
-    end = min(start + page_size, total)
-    page_items = items[start:end]
-    page_info = f"Страница {page}/{total_pages} (элементы {start+1}-{end} из {total})"
-    return page_items, page_info, total_pages
+    def __init__(self, repo, log_writer, top_commands, view=views, prefetcher=None, session_factory=None):
+        self.repo = repo
+        self.session_factory = session_factory
+        self.log_writer = log_writer
+        self.top_commands = top_commands
+        self.view = view
+        self.prefetcher = prefetcher
+        self.casts = {}  # film_id -> актёры фильма (загружаются один раз за сессию)
+        self._pending_casts = None  # (film_ids, Future) — фоновая загрузка составов текущей страницы
+        # Стек для возврата (back): хранит не списки, а описание экрана (source) и позицию
+        self.context_stack = deque(maxlen=STACK_DEPTH)
+        self._screens = OrderedDict()  # source -> (пагинатор, данные) последних экранов
+        self.current_context = 'home'
+        self.breadcrumb = 'Главная'
+        self.source = ('home',)  # Описание текущего экрана, по нему экран восстанавливается (см. _materialize)
+        self.paginator = None  # Пагинатор текущего списка (ListPager/KeysetPager), None — без страниц
+        self.current_data = []  # Текущие элементы без пагинации (категории, карточка фильма)
+        self.current_section = ''  # Для заголовков (например, "поиск", "фильтр")
 
-def main():
-    # Основные переменные состояния
-    context_stack = []  # Стек для возврата (back)
-    current_context = 'home'
-    breadcrumb = 'Главная'
-    paginator = {'page': 1, 'total_pages': 1}
-    current_data = []  # Текущий список элементов (фильмы, актёры и т.д.)
-    current_section = ''  # Для заголовков (например, "поиск", "фильтр")
-
-    with db_session() as cursor:
-        repo = Repository(cursor)
-        # Создаём таблицы логов, если их нет
-        repo.create_search_log_table()
-        repo.create_command_log_table()
-
-        show_welcome()
-        show_help()
+    def _materialize(self, source):
+        """
+        Создаёт пагинатор и данные экрана по его описанию:
+            ('home',), ('categories',), ('film', фильм), ('top_queries', период),
+            ('random', id фильмов),
+            ('keyset', метод выборки, метод подсчёта, параметры) — список из БД (KeysetPager),
+            ('refine', описание исходного списка, условия) — исходный список, уточнённый в памяти.
+        Возвращает (пагинатор или None, данные без пагинации).
+        """
+        kind = source[0]
+        if kind == 'categories':
+            return None, self.repo.get_categories()
+        if kind == 'film':
+            return None, [source[1]]
+        if kind == 'top_queries':
+            return ListPager(self.top_commands.top(15, source[1])), []
+        if kind == 'random':
+            return ListPager(self.repo.get_films_by_ids(list(source[1]))), []
+        if kind == 'keyset':
+            _, fetch, count, args = source
+            return KeysetPager(getattr(self.repo, fetch), getattr(self.repo, count), args), []
+        if kind == 'refine':
+            _, base, criteria = source
+            paginator, _ = self._materialize(base)
+            films = paginator.all_items(REFINE_MAX_ROWS) or []
+            for criterion in criteria:
+                films = self._refine(films, *criterion)
+            return ListPager(films), []
+        return None, []
 
-        while True:
-            cmd = input("\n> ").strip()
-            if not cmd:
-                continue
-            repo.log_command(cmd)
+    def _remember(self):
+        """
+        Кладёт текущий экран в кэш последних экранов (для быстрого back).
+        """
+        self._screens[self.source] = (self.paginator, self.current_data)
+        self._screens.move_to_end(self.source)
+        while len(self._screens) > SCREEN_CACHE_SIZE:
+            self._screens.popitem(last=False)
 
+    def _leave(self):
+        """
+        Отменяет фоновую подгрузку для текущего экрана: пользователь с него уходит.
+        """
+        if self.paginator is not None:
+            self.paginator.cancel_prefetch()
+        if self._pending_casts is not None:
+            self._pending_casts[1].cancel()
+            self._pending_casts = None
 
-            # Пагинация
-            if cmd == 'next':
-                if paginator['page'] < paginator['total_pages']:
-                    paginator['page'] += 1
-                    refresh_display(current_context, current_data, paginator, breadcrumb, current_section)
-                else:
-                    show_error("Вы уже на последней странице")
-                continue
-            if cmd == 'prev':
-                if paginator['page'] > 1:
-                    paginator['page'] -= 1
-                    refresh_display(current_context, current_data, paginator, breadcrumb, current_section)
-                else:
-                    show_error("Вы уже на первой странице")
-                continue
+    def _push(self):
+        """
+        Сохраняет текущий экран в стек возврата: описание, страницу и заголовки.
+        """
+        self._leave()
+        self._remember()
+        self.context_stack.append({
+            'context': self.current_context,
+            'breadcrumb': self.breadcrumb,
+            'source': self.source,
+            'position': self.paginator.position() if self.paginator is not None else None,
+            'section': self.current_section
+        })
 
-            # Возврат (back)
-            if cmd == 'back':
-                if context_stack:
-                    state = context_stack.pop()
-                    current_context = state['context']
-                    breadcrumb = state['breadcrumb']
-                    current_data = state['data']
-                    paginator = state['paginator']
-                    current_section = state.get('section', '')
-                    show_breadcrumb(breadcrumb)
-                    refresh_display(current_context, current_data, paginator, breadcrumb, current_section)
-                    if current_context == 'home':
-                        show_welcome()
-                        show_help()
-                else:
-                    show_error("Нет предыдущего экрана.")
-                continue
+    def _open(self, source):
+        """
+        Создаёт новый экран по описанию и делает его текущим (после _push).
+        Возвращает его пагинатор.
+        """
+        self.source = source
+        self.paginator, self.current_data = self._materialize(source)
+        return self.paginator
 
-            # Главная (home)
-            if cmd == 'home':
-                current_context = 'home'
-                breadcrumb = 'Главная'
-                context_stack.clear()
-                paginator = {'page': 1, 'total_pages': 1}
-                current_data = []
-                current_section = ''
-                show_welcome()
-                show_help()
-                continue
+    def _restore(self, state):
+        """
+        Восстанавливает экран из стека: из кэша последних экранов, если он там есть, иначе из БД.
+        """
+        self._leave()
+        self.current_context = state['context']
+        self.breadcrumb = state['breadcrumb']
+        self.current_section = state['section']
+        self.source = state['source']
+        screen = self._screens.get(self.source)
+        self.paginator, self.current_data = screen if screen is not None else self._materialize(self.source)
+        if self.paginator is not None:
+            self.paginator.restore(*state['position'])
+        self._remember()
 
-            # Выход
-            if cmd == 'exit':
-                show_exit_message()
-                break
+    def _store_casts(self, casts):
+        if len(self.casts) + len(casts) > CAST_MAP_SIZE:
+            self.casts.clear()
+        self.casts.update(casts)
 
-            # Справка
-            if cmd == 'help':
-                show_help()
-                continue
+    def _get_actors(self, film_id):
+        """
+        Возвращает актёров фильма из карты составов сессии.
+        Если состава там нет — берёт его из фоновой загрузки или запрашивает.
+        """
+        if film_id not in self.casts and self._pending_casts is not None:
+            film_ids, future = self._pending_casts
+            if film_id in film_ids:
+                self._pending_casts = None
+                casts = result_or_none(future)
+                if casts is not None:
+                    self._store_casts(casts)
+        if film_id not in self.casts:
+            self._store_casts(self.repo.get_actors_for_films([film_id]))
+        return self.casts[film_id]
 
-            # --- Основные команды ---
-            if cmd == 'categories':
-                categories = repo.get_categories()
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'categories'
-                breadcrumb = 'Главная > Категории'
-                current_data = categories
-                paginator = {'page': 1, 'total_pages': 1}
-                show_breadcrumb(breadcrumb)
-                show_categories(categories)
-                continue
+    def _refine(self, films, kind, value):
+        """
+        Уточняет список фильмов в памяти (см. filters.refine_films).
+        Для условия по актёру недостающие составы загружаются одним запросом.
+        """
+        casts = None
+        if kind == 'actor':
+            casts = {film.film_id: self.casts[film.film_id] for film in films if film.film_id in self.casts}
+            missing = [film.film_id for film in films if film.film_id not in casts]
+            if missing:
+                loaded = self.repo.get_actors_for_films(missing)
+                casts.update(loaded)
+                self._store_casts(loaded)
+        return refine_films(films, kind, value, casts)
 
-            if cmd == 'actors':
-                top_actors = repo.get_top_actors()
-                all_actors = repo.get_all_actors()
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'actors'
-                breadcrumb = 'Главная > Актёры'
-                current_data = all_actors
-                paginator['page'] = 1
-                page_items, page_info, total_pages = paginate(all_actors, paginator['page'])
-                paginator['total_pages'] = total_pages
-                show_breadcrumb(breadcrumb)
-                show_top_actors(top_actors)
-                show_actors_list(page_items, page_info)
-                continue
+    def _prefetch(self):
+        """
+        Запускает в фоне загрузку следующей страницы и составов актёров фильмов текущей страницы.
+        """
+        if self.prefetcher is None or self.paginator is None:
+            return
+        if isinstance(self.paginator, KeysetPager):
+            self.paginator.prefetch_next(self.prefetcher)
+        page_items, _ = self.paginator.current()
+        film_ids = [film.film_id for film in page_items
+                    if isinstance(film, Film) and film.film_id not in self.casts]
+        if self._pending_casts is not None:
+            if self._pending_casts[0] == set(film_ids):
+                return  # Составы этой страницы уже загружаются
+            self._pending_casts[1].cancel()  # Составы прошлой страницы уже не нужны
+            self._pending_casts = None
+        if film_ids:
+            # Составы всех фильмов страницы — одним запросом
+            future = self.prefetcher.submit(self.repo.get_actors_for_films, film_ids)
+            if future is not None:
+                self._pending_casts = (set(film_ids), future)
 
-            if cmd == 'top_queries':
-                queries = repo.get_top_commands()
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'top_queries'
-                breadcrumb = 'Главная > Популярные команды'
-                current_data = queries
-                paginator['page'] = 1
-                page_items, page_info, total_pages = paginate(queries, paginator['page'])
-                paginator['total_pages'] = total_pages
-                show_breadcrumb(breadcrumb)
-                show_top_queries(page_items, page_info)
-                continue
+    def handle(self, cmd):
+        """
+        Выполняет одну команду пользователя. Возвращает False после команды exit.
+        После команды в фоне подгружается то, что, скорее всего, понадобится следующим.
+        """
+        if self.session_factory is None:
+            return self._handle_and_prefetch(cmd)
+        with self.session_factory() as cursor:
+            self.repo.bind(cursor)
+            try:
+                return self._handle_and_prefetch(cmd)
+            finally:
+                self.repo.cursor.close()  # Завершает замер последнего запроса
+                self.repo.bind(None)
+
+    def _handle_and_prefetch(self, cmd):
+        keep_going = self._handle(cmd)
+        if keep_going:
+            self._prefetch()
+        return keep_going
+
+    def _handle(self, cmd):
+        self.log_writer.log_command(cmd)
+        self.top_commands.add(cmd)
+
+        # Пагинация
+        if cmd == 'next':
+            if self.paginator is not None and self.paginator.next():
+                self.refresh_display()
+            else:
+                self.view.show_error("Вы уже на последней странице")
+            return True
+        if cmd == 'prev':
+            if self.paginator is not None and self.paginator.prev():
+                self.refresh_display()
+            else:
+                self.view.show_error("Вы уже на первой странице")
+            return True
+
+        # Возврат (back)
+        if cmd == 'back':
+            if self.context_stack:
+                self._restore(self.context_stack.pop())
+                self.view.show_breadcrumb(self.breadcrumb)
+                self.refresh_display()
+                if self.current_context == 'home':
+                    self.view.show_welcome()
+                    self.view.show_help()
+            else:
+                self.view.show_error("Нет предыдущего экрана.")
+            return True
+
+        # Главная (home)
+        if cmd == 'home':
+            self._leave()
+            self.current_context = 'home'
+            self.breadcrumb = 'Главная'
+            self.context_stack.clear()
+            self._screens.clear()
+            self.source = ('home',)
+            self.paginator = None
+            self.current_data = []
+            self.current_section = ''
+            self.view.show_welcome()
+            self.view.show_help()
+            return True
+
+        # Выход
+        if cmd == 'exit':
+            self.view.show_exit_message()
+            return False
 
-            if cmd == 'random':
-                film = repo.get_random_film()
-                if film:
-                    actors = repo.get_actors_by_film_id(film.film_id)
-                    context_stack.append({
-                        'context': current_context,
-                        'breadcrumb': breadcrumb,
-                        'data': current_data,
-                        'paginator': paginator.copy(),
-                        'section': current_section
-                    })
-                    current_context = 'film'
-                    breadcrumb = f"Главная > Случайный фильм > {film.title}"
-                    current_data = [film]
-                    paginator = {'page': 1, 'total_pages': 1}
-                    show_breadcrumb(breadcrumb)
-                    show_film_details(film, actors)
+        # Справка
+        if cmd == 'help':
+            self.view.show_help()
+            return True
+
+        # --- Основные команды ---
+        if cmd == 'categories':
+            self._push()
+            self._open(('categories',))
+            self.current_context = 'categories'
+            self.breadcrumb = 'Главная > Категории'
+            self.view.show_breadcrumb(self.breadcrumb)
+            self.view.show_categories(self.current_data)
+            return True
+
+        if cmd == 'actors':
+            # Топ актёров и первая страница списка независимы — топ считается в фоне
+            top_future = self.prefetcher.submit(self.repo.get_top_actors) if self.prefetcher else None
+            self._push()
+            self._open(('keyset', 'get_all_actors', 'count_actors', ()))
+            page_items, page_info = self.paginator.current()
+            top_actors = result_or_none(top_future) if top_future is not None else None
+            if top_actors is None:
+                top_actors = self.repo.get_top_actors()
+            self.current_context = 'actors'
+            self.breadcrumb = 'Главная > Актёры'
+            self.view.show_breadcrumb(self.breadcrumb)
+            self.view.show_top_actors(top_actors)
+            self.view.show_actors_list(page_items, page_info)
+            return True
+
+        if cmd == 'top_queries' or cmd.startswith('top_queries '):
+            period = cmd[len('top_queries'):].strip() or None
+            if period is not None and period not in TOP_PERIODS:
+                self.view.show_error("Период: " + " | ".join(TOP_PERIODS))
+                return True
+            self._push()
+            self._open(('top_queries', period))
+            self.current_context = 'top_queries'
+            self.breadcrumb = 'Главная > Популярные команды'
+            page_items, page_info = self.paginator.current()
+            self.current_section = TOP_PERIODS[period][1] if period else ''
+            self.view.show_breadcrumb(self.breadcrumb)
+            self.view.show_top_queries(page_items, page_info, period=self.current_section)
+            return True
+
+        if cmd == 'random' or cmd.startswith('random '):
+            # random [N] [жанр] [год]: четырёхзначное число — год, другое число — N
+            count, genre, year = 1, None, None
+            for part in cmd.split()[1:]:
+                if part.isdigit() and len(part) == 4:
+                    year = part
+                elif part.isdigit():
+                    count = min(max(1, int(part)), RANDOM_MAX_FILMS)
                 else:
-                    show_error("Не удалось получить случайный фильм.")
-                continue
+                    genre = part
+            if count > 1:
+                films = self.repo.get_random_films(count, genre, year)
+                if not films:
+                    self.view.show_error("Не удалось получить случайные фильмы.")
+                    return True
+                self._push()
+                self.source = ('random', tuple(film.film_id for film in films))
+                self.current_context = 'search'
+                self.breadcrumb = "Главная > Случайные фильмы"
+                self.current_data = []
+                self.paginator = ListPager(films)
+                page_items, page_info = self.paginator.current()
+                self.current_section = "случайные"
+                self.view.show_breadcrumb(self.breadcrumb)
+                self.view.show_search_results(page_items, page_info, section=self.current_section)
+                return True
+            film = self.repo.get_random_film(genre, year)
+            if film:
+                self.repo.load_description(film)
+                actors = self._get_actors(film.film_id)
+                self._push()
+                self._open(('film', film))
+                self.current_context = 'film'
+                self.breadcrumb = f"Главная > Случайный фильм > {film.title}"
+                self.view.show_breadcrumb(self.breadcrumb)
+                self.view.show_film_details(film, actors)
+            else:
+                self.view.show_error("Не удалось получить случайный фильм.")
+            return True
 
-            # --- Поиск и фильтрация ---
-            if cmd.startswith("search "):
-                keyword = cmd[7:].strip()
-                results = repo.search_films(keyword)
-                repo.log_search(keyword)
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'search'
-                breadcrumb = f"Главная > Поиск: {keyword}"
-                current_data = results
-                paginator['page'] = 1
-                page_items, page_info, total_pages = paginate(results, paginator['page'])
-                paginator['total_pages'] = total_pages
-                current_section = "поиск"
-                show_breadcrumb(breadcrumb)
-                show_search_results(page_items, page_info, section=current_section)
-                continue
+        if cmd == 'query_stats' or cmd == 'query_stats reset':
+            if cmd.endswith('reset'):
+                query_stats.reset()
+                self.repo.result_cache.reset_stats()
+            self.view.show_query_stats(query_stats.summary())
+            self.view.show_cache_stats(self.repo.result_cache.stats())
+            self.view.show_log_stats(self.log_writer.stats())
+            return True
 
-            if cmd.startswith("filter"):
-                parts = cmd.split()
-                genre = parts[1] if len(parts) > 1 else None
-                actor = parts[2] if len(parts) > 2 else None
-                year = parts[3] if len(parts) > 3 else None
-                results = repo.filter_films(genre, actor, year)
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'filter'
-                breadcrumb = "Главная > Фильтр"
-                current_data = results
-                paginator['page'] = 1
-                page_items, page_info, total_pages = paginate(results, paginator['page'])
-                paginator['total_pages'] = total_pages
-                current_section = "фильтр"
-                show_breadcrumb(breadcrumb)
-                show_search_results(page_items, page_info, section=current_section)
-                continue
+        # --- Поиск и фильтрация ---
+        if cmd.startswith("search "):
+            keyword = cmd[7:].strip()
+            descriptions = keyword.startswith("-d ")
+            if descriptions:
+                keyword = keyword[3:].strip()
+            self.log_writer.log_search(keyword)
+            self._push()
+            self._open(('keyset', 'search_films', 'count_search_films', (keyword, descriptions)))
+            self.current_context = 'search'
+            self.breadcrumb = f"Главная > Поиск: {keyword}"
+            page_items, page_info = self.paginator.current()
+            self.current_section = "поиск"
+            self.view.show_breadcrumb(self.breadcrumb)
+            self.view.show_search_results(page_items, page_info, section=self.current_section)
+            return True
 
-            # --- Выбор по номеру ---
-            if cmd.isdigit():
-                idx = int(cmd)
-                # Категории (без пагинации)
-                if current_context == 'categories':
-                    categories = current_data
-                    if 1 <= idx <= len(categories):
-                        category = categories[idx - 1]
-                        films = repo.get_films_by_category(category.category_id)
-                        context_stack.append({
-                            'context': current_context,
-                            'breadcrumb': breadcrumb,
-                            'data': current_data,
-                            'paginator': paginator.copy(),
-                            'section': current_section
-                        })
-                        current_context = 'search'
-                        breadcrumb = f"Главная > Категории > {category.name}"
-                        current_data = films
-                        paginator['page'] = 1
-                        page_items, page_info, total_pages = paginate(films, paginator['page'])
-                        paginator['total_pages'] = total_pages
-                        current_section = "категория"
-                        show_breadcrumb(breadcrumb)
-                        show_search_results(page_items, page_info, section=current_section)
-                    else:
-                        show_error("Категория с таким номером не найдена.")
-                    continue
-
-                # Актёры (с пагинацией)
-                if current_context == 'actors':
-                    all_actors = current_data
-                    page_items, page_info, total_pages = paginate(all_actors, paginator['page'])
-                    if 1 <= idx <= len(page_items):
-                        actor = page_items[idx - 1]
-                        films = repo.get_films_by_actor(actor.full_name())
-                        context_stack.append({
-                            'context': current_context,
-                            'breadcrumb': breadcrumb,
-                            'data': current_data,
-                            'paginator': paginator.copy(),
-                            'section': current_section
-                        })
-                        current_context = 'search'
-                        breadcrumb = f"Главная > Актёры > {actor.full_name()}"
-                        current_data = films
-                        paginator['page'] = 1
-                        page_items, page_info, total_pages = paginate(films, paginator['page'])
-                        paginator['total_pages'] = total_pages
-                        current_section = "поиск по актёру"
-                        show_breadcrumb(breadcrumb)
-                        show_search_results(page_items, page_info, section=current_section)
-                    else:
-                        show_error("Неверный номер актёра.")
-                    continue
-
-                # Фильмы (поиск, фильтр, поиск по актёру)
-                if current_context in ['search', 'filter', 'top_queries', 'actors']:
-                    films = current_data
-                    page_items, page_info, total_pages = paginate(films, paginator['page'])
-                    if 1 <= idx <= len(page_items):
-                        film = page_items[idx - 1]
-                        actors = repo.get_actors_by_film_id(film.film_id)
-                        context_stack.append({
-                            'context': current_context,
-                            'breadcrumb': breadcrumb,
-                            'data': current_data,
-                            'paginator': paginator.copy(),
-                            'section': current_section
-                        })
-                        current_context = 'film'
-                        breadcrumb = f"{breadcrumb} > {film.title}"
-                        current_data = [film]
-                        paginator = {'page': 1, 'total_pages': 1}
-                        show_breadcrumb(breadcrumb)
-                        show_film_details(film, actors)
-                    else:
-                        show_error("Неверный номер фильма.")
-                    continue
-
-                # Карточка фильма (выбор актёра)
-                if current_context == 'film':
-                    film = current_data[0]
-                    actors = repo.get_actors_by_film_id(film.film_id)
-                    if 1 <= idx <= len(actors):
-                        actor = actors[idx - 1]
-                        films = repo.get_films_by_actor(actor.full_name())
-                        context_stack.append({
-                            'context': current_context,
-                            'breadcrumb': breadcrumb,
-                            'data': current_data,
-                            'paginator': paginator.copy(),
-                            'section': current_section
-                        })
-                        current_context = 'search'
-                        breadcrumb = f"{breadcrumb} > {actor.full_name()}"
-                        current_data = films
-                        paginator['page'] = 1
-                        page_items, page_info, total_pages = paginate(films, paginator['page'])
-                        paginator['total_pages'] = total_pages
-                        current_section = "поиск по актёру"
-                        show_breadcrumb(breadcrumb)
-                        show_search_results(page_items, page_info, section=current_section)
-                    else:
-                        show_error("Неверный номер актёра.")
-                    continue
-
-            # --- Поиск по имени категории ---
-            if current_context == 'categories':
-                categories = current_data
-                found = False
-                for category in categories:
-                    if cmd.lower() == category.name.lower():
-                        films = repo.get_films_by_category(category.category_id)
-                        context_stack.append({
-                            'context': current_context,
-                            'breadcrumb': breadcrumb,
-                            'data': current_data,
-                            'paginator': paginator.copy(),
-                            'section': current_section
-                        })
-                        current_context = 'search'
-                        breadcrumb = f"Главная > Категории > {category.name}"
-                        current_data = films
-                        paginator['page'] = 1
-                        page_items, page_info, total_pages = paginate(films, paginator['page'])
-                        paginator['total_pages'] = total_pages
-                        current_section = "категория"
-                        show_breadcrumb(breadcrumb)
-                        show_search_results(page_items, page_info, section=current_section)
-                        found = True
-                        break
-                if not found:
-                    show_error("Категория не найдена.")
-                continue
+        if cmd.startswith("filter"):
+            parts = cmd.split()
+            genre = parts[1] if len(parts) > 1 else None
+            actor = parts[2] if len(parts) > 2 else None
+            year = parts[3] if len(parts) > 3 else None
+            try:
+                film_filter = FilmFilter.parse(genre, actor, year)
+            except ValueError:
+                self.view.show_error("Год указывается числом или диапазоном, например 2006 или 2005-2007.")
+                return True
+            self._push()
+            self._open(('keyset', 'filter_films', 'count_filter_films', (film_filter,)))
+            self.current_context = 'filter'
+            self.breadcrumb = "Главная > Фильтр"
+            page_items, page_info = self.paginator.current()
+            self.current_section = "фильтр"
+            self.view.show_breadcrumb(self.breadcrumb)
+            self.view.show_search_results(page_items, page_info, section=self.current_section)
+            return True
 
-            # --- Поиск по имени актёра или названию фильма ---
-            films = repo.search_films(cmd)
-            if films:
-                repo.log_search(cmd)
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'search'
-                breadcrumb = f"Главная > Поиск: {cmd}"
-                current_data = films
-                paginator['page'] = 1
-                page_items, page_info, total_pages = paginate(films, paginator['page'])
-                paginator['total_pages'] = total_pages
-                current_section = "поиск"
-                show_breadcrumb(breadcrumb)
-                show_search_results(page_items, page_info, section=current_section)
-                continue
-            films = repo.get_films_by_actor(cmd)
-            if films:
-                context_stack.append({
-                    'context': current_context,
-                    'breadcrumb': breadcrumb,
-                    'data': current_data,
-                    'paginator': paginator.copy(),
-                    'section': current_section
-                })
-                current_context = 'search'
-                breadcrumb = f"Главная > Актёры > {cmd}"
-                current_data = films
-                paginator['page'] = 1
-                page_items, page_info, total_pages = paginate(films, paginator['page'])
-                paginator['total_pages'] = total_pages
-                current_section = "поиск по актёру"
-                show_breadcrumb(breadcrumb)
-                show_search_results(page_items, page_info, section=current_section)
-                continue
+        # --- Уточнение текущего списка фильмов в памяти ---
+        if cmd == 'refine' or cmd.startswith('refine '):
+            parts = cmd.split(maxsplit=2)
+            kind = parts[1] if len(parts) > 1 else ''
+            value = parts[2].strip() if len(parts) > 2 else ''
+            try:
+                check_refinement(kind, value)
+            except ValueError as e:
+                self.view.show_error(str(e))
+                return True
+            if self.current_context not in ['search', 'filter'] or self.paginator is None:
+                self.view.show_error("Уточнять можно только список фильмов (поиск, фильтр, категория).")
+                return True
+            films = self.paginator.all_items(REFINE_MAX_ROWS)
+            if films is None:
+                self.view.show_error(f"В списке больше {REFINE_MAX_ROWS} фильмов — сузьте его командой filter или search.")
+                return True
+            base, criteria = (self.source[1], self.source[2]) if self.source[0] == 'refine' else (self.source, ())
+            films = self._refine(films, kind, value)
+            self._push()
+            # Экран восстанавливается по исходному списку и всем условиям уточнения
+            self.source = ('refine', base, criteria + ((kind, value),))
+            self.paginator = ListPager(films)
+            self.current_data = []
+            self.breadcrumb = f"{self.breadcrumb} > {kind}: {value}"
+            self.current_section = "уточнение"
+            page_items, page_info = self.paginator.current()
+            self.view.show_breadcrumb(self.breadcrumb)
+            self.view.show_search_results(page_items, page_info, section=self.current_section)
+            return True
+
+        # --- Выбор по номеру ---
+        if cmd.isdigit():
+            idx = int(cmd)
+            # Категории (без пагинации)
+            if self.current_context == 'categories':
+                categories = self.current_data
+                if 1 <= idx <= len(categories):
+                    category = categories[idx - 1]
+                    self._push()
+                    self._open(('keyset', 'get_films_by_category', 'count_films_by_category',
+                                (category.category_id,)))
+                    self.current_context = 'search'
+                    self.breadcrumb = f"Главная > Категории > {category.name}"
+                    page_items, page_info = self.paginator.current()
+                    self.current_section = "категория"
+                    self.view.show_breadcrumb(self.breadcrumb)
+                    self.view.show_search_results(page_items, page_info, section=self.current_section)
+                else:
+                    self.view.show_error("Категория с таким номером не найдена.")
+                return True
 
-            show_error("Неизвестная команда. Введите 'help' для списка команд.")
+            # Актёры (с пагинацией)
+            if self.current_context == 'actors':
+                page_items, _ = self.paginator.current()
+                if 1 <= idx <= len(page_items):
+                    actor = page_items[idx - 1]
+                    self._push()
+                    self._open(('keyset', 'get_films_by_actor_id', 'count_films_by_actor_id', (actor.actor_id,)))
+                    self.current_context = 'search'
+                    self.breadcrumb = f"Главная > Актёры > {actor.full_name()}"
+                    page_items, page_info = self.paginator.current()
+                    self.current_section = "поиск по актёру"
+                    self.view.show_breadcrumb(self.breadcrumb)
+                    self.view.show_search_results(page_items, page_info, section=self.current_section)
+                else:
+                    self.view.show_error("Неверный номер актёра.")
+                return True
+
+            # Фильмы (поиск, фильтр, поиск по актёру)
+            if self.current_context in ['search', 'filter', 'top_queries', 'actors']:
+                page_items, _ = self.paginator.current()
+                if 1 <= idx <= len(page_items):
+                    film = self.repo.load_description(page_items[idx - 1])
+                    actors = self._get_actors(film.film_id)
+                    self._push()
+                    self._open(('film', film))
+                    self.current_context = 'film'
+                    self.breadcrumb = f"{self.breadcrumb} > {film.title}"
+                    self.view.show_breadcrumb(self.breadcrumb)
+                    self.view.show_film_details(film, actors)
+                else:
+                    self.view.show_error("Неверный номер фильма.")
+                return True
 
-def refresh_display(current_context, current_data, paginator, breadcrumb, current_section):
+            # Карточка фильма (выбор актёра)
+            if self.current_context == 'film':
+                film = self.current_data[0]
+                actors = self._get_actors(film.film_id)
+                if 1 <= idx <= len(actors):
+                    actor = actors[idx - 1]
+                    self._push()
+                    self._open(('keyset', 'get_films_by_actor_id', 'count_films_by_actor_id', (actor.actor_id,)))
+                    self.current_context = 'search'
+                    self.breadcrumb = f"{self.breadcrumb} > {actor.full_name()}"
+                    page_items, page_info = self.paginator.current()
+                    self.current_section = "поиск по актёру"
+                    self.view.show_breadcrumb(self.breadcrumb)
+                    self.view.show_search_results(page_items, page_info, section=self.current_section)
+                else:
+                    self.view.show_error("Неверный номер актёра.")
+                return True
+
+        # --- Поиск по имени категории ---
+        if self.current_context == 'categories':
+            for category in self.current_data:
+                if cmd.lower() == category.name.lower():
+                    self._push()
+                    self._open(('keyset', 'get_films_by_category', 'count_films_by_category',
+                                (category.category_id,)))
+                    self.current_context = 'search'
+                    self.breadcrumb = f"Главная > Категории > {category.name}"
+                    page_items, page_info = self.paginator.current()
+                    self.current_section = "категория"
+                    self.view.show_breadcrumb(self.breadcrumb)
+                    self.view.show_search_results(page_items, page_info, section=self.current_section)
+                    return True
+            self.view.show_error("Категория не найдена.")
+            return True
+
+        # --- Свободный текст: название фильма, имя актёра или категория ---
+        matches = self.repo.resolve(cmd)
+        if not matches:
+            self.view.show_error("Неизвестная команда. Введите 'help' для списка команд.")
+            return True
+        match = matches[0]
+        self._push()
+        if match.kind == 'title':
+            self.log_writer.log_search(cmd)
+            self._open(('keyset', 'search_films', 'count_search_films', (cmd,)))
+            self.breadcrumb = f"Главная > Поиск: {cmd}"
+            self.current_section = "поиск"
+        elif match.kind == 'category':
+            self._open(('keyset', 'get_films_by_category', 'count_films_by_category',
+                        (match.target.category_id,)))
+            self.breadcrumb = f"Главная > Категории > {match.target.name}"
+            self.current_section = "категория"
+        elif match.kind == 'actor':
+            self._open(('keyset', 'get_films_by_actor_id', 'count_films_by_actor_id', (match.target.actor_id,)))
+            self.breadcrumb = f"Главная > Актёры > {match.target.full_name()}"
+            self.current_section = "поиск по актёру"
+        else:
+            # Несколько актёров: их id уже известны, фильтр не ищет их повторно
+            film_filter = FilmFilter(actors=[cmd], actor_ids=[actor.actor_id for actor in match.target])
+            self._open(('keyset', 'filter_films', 'count_filter_films', (film_filter,)))
+            self.breadcrumb = f"Главная > Актёры > {cmd}"
+            self.current_section = "поиск по актёру"
+        self.current_context = 'search'
+        page_items, page_info = self.paginator.current()
+        self.view.show_breadcrumb(self.breadcrumb)
+        self.view.show_search_results(page_items, page_info, section=self.current_section)
+        return True
+
+    def refresh_display(self):
+        """
+        Обновляет вывод текущего экрана (например, после next/prev/back).
+        """
+        self.view.show_breadcrumb(self.breadcrumb)
+        if self.current_context == 'categories':
+            self.view.show_categories(self.current_data)
+        elif self.current_context == 'actors':
+            page_items, page_info = self.paginator.current()
+            self.view.show_actors_list(page_items, page_info)
+        elif self.current_context in ['search', 'filter']:
+            page_items, page_info = self.paginator.current()
+            self.view.show_search_results(page_items, page_info, section=self.current_section)
+        elif self.current_context == 'top_queries':
+            page_items, page_info = self.paginator.current()
+            self.view.show_top_queries(page_items, page_info, period=self.current_section)
+        elif self.current_context == 'film':
+            film = self.current_data[0]
+            # Для карточки фильма всегда показываем всех актёров
+            actors = self._get_actors(film.film_id)
+            self.view.show_film_details(film, actors)
+
+def top_commands_counter(session_factory=db_session):
     """
-    Обновляет вывод текущего экрана (например, после next/prev/back).
+    Возвращает TopCounter, который перечитывает топ команд на отдельном соединении.
     """
-    show_breadcrumb(breadcrumb)
-    if current_context == 'categories':
-        show_categories(current_data)
-    elif current_context == 'actors':
-        page_items, page_info, _ = paginate(current_data, paginator['page'])
-        show_actors_list(page_items, page_info)
-    elif current_context in ['search', 'filter']:
-        page_items, page_info, _ = paginate(current_data, paginator['page'])
-        show_search_results(page_items, page_info, section=current_section)
-    elif current_context == 'top_queries':
-        page_items, page_info, _ = paginate(current_data, paginator['page'])
-        show_top_queries(page_items, page_info)
-    elif current_context == 'film':
-        film = current_data[0]
-        # Для карточки фильма всегда показываем всех актёров
-        from repository import Repository  # Импорт тут, чтобы не было циклических
-        with db_session() as cursor:
-            repo = Repository(cursor)
-            actors = repo.get_actors_by_film_id(film.film_id)
-        show_film_details(film, actors)
+    def load(limit, since):
+        with session_factory() as cursor:
+            return Repository(cursor).get_top_commands(limit, since)
+    return TopCounter(load)
+
+def main():
+    ensure_schema()
+    # Каждая команда читает каталог в своей короткой транзакции (в режиме READ_ONLY — из снимка),
+    # логи пишутся в фоне отдельными соединениями и фиксируются при каждом сбросе.
+    # Без снимка в режиме READ_ONLY catalog_factory сообщает, как его создать.
+    try:
+        catalog = catalog_factory()
+    except RuntimeError as e:
+        views.show_error(e)
+        raise SystemExit(1)
+
+    show_welcome()
+    if READ_ONLY:
+        views.show_snapshot_info(read_snapshot_info())
+    show_help()
+
+    log_writer = LogWriter().start()
+    prefetcher = Prefetcher(session_factory=catalog) if PREFETCH_ENABLED else None
+    navigator = Navigator(Repository(), log_writer, top_commands_counter(),
+                          prefetcher=prefetcher, session_factory=catalog)
+    try:
+        while True:
+            cmd = input("\n> ").strip()
+            if not cmd:
+                continue
+            if not navigator.handle(cmd):
+                break
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+        log_writer.close()
+        if log_writer.dropped or log_writer.failed:
+            views.show_log_stats(log_writer.stats())
+        if QUERY_STATS_FILE:
+            query_stats.dump(QUERY_STATS_FILE)
 
 if __name__ == "__main__":
     main()
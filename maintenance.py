@@ -0,0 +1,71 @@
+# Обслуживание таблиц логов (all_command_log, student_search_log).
+# Сырые логи только дописываются, а топы читаются из счётчиков (*_stats,
+# *_daily_stats), поэтому старые записи логов можно удалять: перед удалением
+# дни, которые уходят из сырых логов, пересчитываются в *_daily_stats, затем
+# записи старше LOG_RETENTION_DAYS удаляются по диапазонам id в коротких
+# транзакциях (по индексу на времени, без долгой блокировки таблицы).
+# Заодно добавляет индексы на время и текст в таблицы, созданные без них.
+# Запускается отдельно от приложения (например, раз в сутки из cron).
+#
+# Запуск:
+#   python maintenance.py                      # свернуть и удалить логи старше LOG_RETENTION_DAYS
+#   python maintenance.py --retention-days 30  # другой срок хранения
+#   python maintenance.py --dry-run            # только показать, сколько записей будет удалено
+
+import argparse
+from datetime import date, timedelta
+
+from db import db_session, get_pool
+from repository import Repository, LOG_TABLES
+from schema import ensure_schema
+from config import LOG_RETENTION_DAYS, LOG_PURGE_BATCH
+
+def purge_logs(session_factory=db_session, retention_days=LOG_RETENTION_DAYS,
+               batch_size=LOG_PURGE_BATCH, dry_run=False, today=None):
+    """
+    Сворачивает старые записи логов в счётчики по дням и удаляет их.
+    Аргументы:
+        session_factory: контекстный менеджер, выдающий курсор (по умолчанию db_session)
+        retention_days: int — сколько последних дней сырых логов оставить
+        batch_size: int — сколько id удалять за одну транзакцию
+        dry_run: bool — ничего не менять, только посчитать
+        today: date — текущий день (по умолчанию date.today())
+    Возвращает словарь {таблица лога: количество удалённых (или подлежащих удалению) записей}.
+    """
+    before = (today or date.today()) - timedelta(days=retention_days)
+    ensure_schema(session_factory)
+    report = {}
+    for log_table, stats, key, time_column in LOG_TABLES:
+        with session_factory() as cursor:
+            first_id, last_id, count = Repository(cursor).get_log_id_range(log_table, time_column, before)
+        if dry_run or not count:
+            report[log_table] = count
+            continue
+        with session_factory() as cursor:
+            Repository(cursor).rollup_log_days(log_table, stats, key, time_column, before)
+        deleted = 0
+        for start in range(first_id, last_id + 1, batch_size):
+            with session_factory() as cursor:
+                deleted += Repository(cursor).purge_log_range(
+                    log_table, time_column, before, start, min(start + batch_size - 1, last_id))
+        report[log_table] = deleted
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание логов ReelDeal: свёртка в счётчики и удаление старых")
+    parser.add_argument("--retention-days", type=int, default=LOG_RETENTION_DAYS,
+                        help="сколько дней хранить сырые логи")
+    parser.add_argument("--batch", type=int, default=LOG_PURGE_BATCH, help="сколько id удалять за транзакцию")
+    parser.add_argument("--dry-run", action="store_true", help="только показать, сколько записей будет удалено")
+    args = parser.parse_args()
+
+    try:
+        report = purge_logs(retention_days=args.retention_days, batch_size=args.batch, dry_run=args.dry_run)
+    finally:
+        get_pool().close()
+    action = "будет удалено" if args.dry_run else "удалено"
+    for log_table, count in report.items():
+        print(f"{log_table}: {action} записей старше {args.retention_days} дн.: {count}")
+
+if __name__ == "__main__":
+    main()
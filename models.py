@@ -1,7 +1,10 @@
 # models.py
 # Содержит простые классы-модели для бизнес-объектов:
 # Film, Actor, Category. Используются для удобства работы с данными,
-# полученными из БД (вместо кортежей).
+# полученными из БД (вместо кортежей). Объявлены с __slots__:
+# списки результатов в стеке навигации занимают меньше памяти.
+
+SHORT_DESCRIPTION_LENGTH = 60  # Длина краткого описания в списках фильмов
 
 class Film:
     """
@@ -10,32 +13,54 @@ class Film:
         film_id: int — идентификатор фильма
         title: str — название фильма
         year: int — год выпуска
-        description: str — описание
-        genre: str — жанр
+        description: str — описание (в списках — только начало)
+        genre: list[str] — жанры (фильм может относиться к нескольким)
+        description_complete: bool — загружено ли описание полностью
+            (полное описание догружает Repository.load_description)
     """
-    def __init__(self, film_id, title, year, description, genre):
+    __slots__ = ("film_id", "title", "year", "description", "genre", "description_complete")
+
+    def __init__(self, film_id, title, year, description, genre, description_complete=True):
         self.film_id = film_id
         self.title = title
         self.year = year
         self.description = description
         self.genre = genre
+        self.description_complete = description_complete
 
-    def get_short_description(self, max_length=60):
+    def get_short_description(self, max_length=SHORT_DESCRIPTION_LENGTH):
         """
         Возвращает сокращённое описание фильма.
         Если описание длиннее max_length, обрезает и добавляет "...".
         """
-        return self.description if len(self.description) <= max_length else self.description[:max_length] + "..."
+        description = self.description or ""
+        return description if len(description) <= max_length else description[:max_length] + "..."
+
+    def to_dict(self):
+        """
+        Возвращает фильм в виде словаря (для JSON).
+        """
+        return {
+            "film_id": self.film_id,
+            "title": self.title,
+            "year": self.year,
+            "description": self.description if self.description_complete else self.get_short_description(),
+            "genre": self.genre,
+        }
 
 class Actor:
     """
     Модель актёра.
     Аргументы конструктора:
+        actor_id: int — идентификатор актёра
         first_name: str — имя
         last_name: str — фамилия
         film_count: int (опционально) — количество фильмов (для топа)
     """
-    def __init__(self, first_name, last_name, film_count=None):
+    __slots__ = ("actor_id", "first_name", "last_name", "film_count")
+
+    def __init__(self, actor_id, first_name, last_name, film_count=None):
+        self.actor_id = actor_id
         self.first_name = first_name
         self.last_name = last_name
         self.film_count = film_count
@@ -46,6 +71,15 @@ class Actor:
         """
         return f"{self.first_name} {self.last_name}"
 
+    def to_dict(self):
+        """
+        Возвращает актёра в виде словаря (для JSON).
+        """
+        result = {"actor_id": self.actor_id, "first_name": self.first_name, "last_name": self.last_name}
+        if self.film_count is not None:
+            result["film_count"] = self.film_count
+        return result
+
 class Category:
     """
     Модель категории (жанра).
@@ -53,6 +87,14 @@ class Category:
         category_id: int — идентификатор категории
         name: str — название жанра
     """
+    __slots__ = ("category_id", "name")
+
     def __init__(self, category_id, name):
         self.category_id = category_id
         self.name = name
+
+    def to_dict(self):
+        """
+        Возвращает категорию в виде словаря (для JSON).
+        """
+        return {"category_id": self.category_id, "name": self.name}
@@ -0,0 +1,199 @@
+# Постраничный вывод списков.
+# paginate() режет уже загруженный список, KeysetPager запрашивает из БД
+# только нужную страницу (keyset-пагинация) и общее количество строк.
+# Используется в main.py для всех списков фильмов и актёров.
+
+from prefetch import result_or_none
+
+PAGE_SIZE = 15  # Количество элементов на странице для пагинации
+
+def format_page_info(page, total_pages, start, end, total):
+    """
+    Возвращает строку с информацией о странице.
+    start — номер первого элемента страницы (с нуля), end — номер после последнего.
+    """
+    return f"Страница {page}/{total_pages} (элементы {start+1}-{end} из {total})"
+
+def paginate(items, page, page_size=PAGE_SIZE):
+    """
+    Вспомогательная функция для постраничного вывода.
+    Возвращает срез списка для текущей страницы и строку с инфо о странице.
+    """
+    total = len(items)
+    total_pages = max(1, (total + page_size - 1) // page_size)
+    page = max(1, min(page, total_pages))
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    page_items = items[start:end]
+    page_info = format_page_info(page, total_pages, start, end, total)
+    return page_items, page_info, total_pages
+
+class ListPager:
+    """
+    Пагинация списка, уже загруженного в память (например, топ команд).
+    Аргументы конструктора:
+        items: list — все элементы
+        page_size: int — размер страницы
+    """
+    def __init__(self, items, page_size=PAGE_SIZE):
+        self.items = items
+        self.page_size = page_size
+        self.page = 1
+
+    @property
+    def total(self):
+        return len(self.items)
+
+    @property
+    def total_pages(self):
+        return max(1, (self.total + self.page_size - 1) // self.page_size)
+
+    def current(self):
+        """
+        Возвращает элементы текущей страницы и строку с инфо о странице.
+        """
+        page_items, page_info, _ = paginate(self.items, self.page, self.page_size)
+        return page_items, page_info
+
+    def all_items(self, limit):
+        """
+        Возвращает все элементы списка или None, если их больше limit.
+        """
+        return self.items if self.total <= limit else None
+
+    def position(self):
+        """
+        Возвращает компактное описание текущей позиции (для стека возврата), см. restore.
+        """
+        return (self.page,)
+
+    def cancel_prefetch(self):
+        """
+        Отменяет фоновую подгрузку страниц (экран покинут). У списка в памяти её нет.
+        """
+
+    def restore(self, page):
+        """
+        Возвращается к позиции, сохранённой position().
+        """
+        self.page = page
+
+    def next(self):
+        """
+        Переходит на следующую страницу. Возвращает False, если это последняя.
+        """
+        if self.page >= self.total_pages:
+            return False
+        self.page += 1
+        return True
+
+    def prev(self):
+        """
+        Переходит на предыдущую страницу. Возвращает False, если это первая.
+        """
+        if self.page <= 1:
+            return False
+        self.page -= 1
+        return True
+
+class KeysetPager(ListPager):
+    """
+    Пагинация выборки из БД по ключу (keyset): каждая страница запрашивается
+    отдельно, начиная после последнего элемента предыдущей страницы.
+    Аргументы конструктора:
+        fetch: метод Repository, принимающий *args, after= и limit=
+        count: метод Repository, возвращающий общее количество строк по *args
+        args: tuple — параметры запроса (ключевое слово, id категории и т.д.)
+        page_size: int — размер страницы
+    Загружается только текущая страница; границы уже просмотренных страниц
+    запоминаются, поэтому prev не требует повторного перебора с начала.
+    """
+    def __init__(self, fetch, count, args=(), page_size=PAGE_SIZE):
+        super().__init__([], page_size)
+        self.fetch = fetch
+        self.args = tuple(args)
+        self._total = count(*self.args)
+        self._bounds = [None]  # _bounds[i] — последний элемент страницы i (None — начало)
+        self._page_items = None  # Кэш текущей страницы
+        self._prefetched = {}  # номер страницы -> Future с её элементами (см. prefetch_next)
+        self._all_items = None  # Вся выборка, если она понадобилась целиком (см. all_items)
+
+    @property
+    def total(self):
+        return self._total
+
+    def current(self):
+        """
+        Возвращает элементы текущей страницы (запрашивая их из БД при необходимости)
+        и строку с инфо о странице.
+        """
+        if self._page_items is None:
+            future = self._prefetched.pop(self.page, None)
+            if future is not None:
+                self._page_items = result_or_none(future)
+            if self._page_items is None:
+                after = self._bounds[self.page - 1]
+                self._page_items = self.fetch(*self.args, after=after, limit=self.page_size)
+            if len(self._bounds) == self.page and self._page_items:
+                self._bounds.append(self._page_items[-1])
+        start = (self.page - 1) * self.page_size
+        end = start + len(self._page_items)
+        return self._page_items, format_page_info(self.page, self.total_pages, start, end, self.total)
+
+    def all_items(self, limit):
+        """
+        Загружает всю выборку одним запросом (один раз) или возвращает None,
+        если в ней больше limit строк.
+        """
+        if self.total > limit:
+            return None
+        if self._all_items is None:
+            self._all_items = self.fetch(*self.args)
+        return self._all_items
+
+    def position(self):
+        # Границы просмотренных страниц нужны, чтобы вернуться на страницу без перебора с начала
+        return (self.page, tuple(self._bounds))
+
+    def restore(self, page, bounds):
+        if page != self.page:
+            self._page_items = None
+        self.page = page
+        if len(bounds) > len(self._bounds):
+            self._bounds = list(bounds)
+
+    def prefetch_next(self, prefetcher):
+        """
+        Запрашивает следующую страницу в фоне (Prefetcher), если она ещё не загружена
+        и известна её граница — последний элемент текущей страницы.
+        """
+        next_page = self.page + 1
+        if (next_page > self.total_pages or next_page in self._prefetched
+                or len(self._bounds) <= self.page):
+            return
+        future = prefetcher.submit(self.fetch, *self.args, after=self._bounds[self.page], limit=self.page_size)
+        if future is not None:
+            self._prefetched[next_page] = future
+
+    def cancel_prefetch(self):
+        # Ещё не начатые задачи снимаются с очереди общего пула; начатые просто забываются
+        for future in self._prefetched.values():
+            future.cancel()
+        self._prefetched.clear()
+
+    def next(self):
+        if self.page >= self.total_pages:
+            return False
+        if len(self._bounds) <= self.page:
+            self.current()  # Граница следующей страницы — последний элемент текущей
+            if len(self._bounds) <= self.page:
+                return False
+        self.page += 1
+        self._page_items = None
+        return True
+
+    def prev(self):
+        if not super().prev():
+            return False
+        self._page_items = None
+        return True
@@ -0,0 +1,70 @@
+# Фоновая подгрузка данных, которые пользователь, скорее всего, запросит следующими:
+# следующая страница списка и составы актёров фильмов текущей страницы.
+# Prefetcher выполняет методы Repository в отдельных потоках, каждый вызов —
+# на своём соединении из пула, поэтому основной курсор сессии не блокируется.
+# Используется Navigator (main.py) и KeysetPager (pagination.py).
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db import db_session
+from repository import Repository
+from config import PREFETCH_WORKERS
+
+MAX_PENDING_PER_WORKER = 2  # Больше задач в очереди на поток не ставится (подгрузка — не обязательная работа)
+
+class Prefetcher:
+    """
+    Пул потоков для фоновых запросов к БД.
+    Аргументы конструктора:
+        session_factory: контекстный менеджер, выдающий курсор (по умолчанию db_session)
+        workers: int — сколько запросов выполнять одновременно (и сколько соединений занимать)
+    """
+    def __init__(self, session_factory=db_session, workers=PREFETCH_WORKERS):
+        self.session_factory = session_factory
+        self.max_pending = workers * MAX_PENDING_PER_WORKER
+        self.pending = 0  # Задачи в очереди и в работе
+        self.skipped = 0  # Не поставлено из-за очереди
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reeldeal-prefetch")
+
+    def _call(self, func, args, kwargs):
+        with self.session_factory() as cursor:
+            return func(Repository(cursor), *args, **kwargs)
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Запускает метод Repository в фоне и возвращает Future с его результатом
+        или None, если очередь уже полна (тогда вызывающий код выполнит запрос сам, если он понадобится).
+        method — метод Repository (можно связанный с другим экземпляром,
+        например self.repo.get_top_actors): он вызывается на новом Repository.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.skipped += 1
+                return None
+            self.pending += 1
+        func = getattr(method, "__func__", method)
+        future = self._executor.submit(self._call, func, args, kwargs)
+        future.add_done_callback(self._done)  # Вызывается и при отмене
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+def result_or_none(future):
+    """
+    Возвращает результат фоновой задачи или None, если она завершилась ошибкой
+    или ещё не начата (тогда она отменяется, а вызывающий код выполняет запрос сам,
+    не дожидаясь очереди). Уже выполняющаяся задача дожидается.
+    """
+    if future.cancel():
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None
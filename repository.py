@@ -2,89 +2,368 @@
 # Методы сгруппированы по сущностям (фильмы, актёры, категории, логирование).
 # Использует курсор, полученный из db_session().
 
-from models import Film, Actor, Category
+from collections import Counter
+from models import Film, Actor, Category, SHORT_DESCRIPTION_LENGTH
+from search import SearchIndex
+from resolver import NameResolver
+from sampling import FilmSampler
+from instrumentation import InstrumentedCursor
+from cache import ResultCache, cached
+from snapshot import catalog_version
+from config import QUERY_STATS_ENABLED
+
+# Таблицы сырых логов: (таблица, префикс таблиц счётчиков, столбец текста, столбец времени)
+LOG_TABLES = (
+    ("all_command_log", "all_command", "command_text", "timestamp"),
+    ("student_search_log", "student_search", "search_query", "search_time"),
+)
+DUPLICATE_KEY_NAME = 1061  # Код ошибки MySQL «индекс с таким именем уже есть»
+IDS_PER_QUERY = 500  # Сколько id передавать в одном IN (...) (SQLite до 3.32 — не больше 999 параметров)
+
+# Столбцы фильма для списков: описание обрезается в БД до длины, нужной для
+# краткого вывода (+1 символ, чтобы понять, было ли оно длиннее).
+# Жанры собираются в одну строку подзапросом, поэтому на фильм приходится ровно
+# одна строка результата, а подзапрос выполняется только для строк страницы.
+FILM_LIST_COLUMNS = (f"f.film_id, f.title, f.release_year, "
+                     f"SUBSTR(f.description, 1, {SHORT_DESCRIPTION_LENGTH + 1}), "
+                     f"(SELECT GROUP_CONCAT(gc.name) FROM film_category gfc "
+                     f"JOIN category gc ON gfc.category_id = gc.category_id "
+                     f"WHERE gfc.film_id = f.film_id)")
+
+def _chunks(ids):
+    """
+    Делит список id на кортежи не длиннее IDS_PER_QUERY.
+    """
+    ids = list(ids)
+    return [tuple(ids[start:start + IDS_PER_QUERY]) for start in range(0, len(ids), IDS_PER_QUERY)]
 
 class Repository:
     """
     Универсальный репозиторий для работы с БД.
-    Все методы принимают self.cursor.
+    Методы каталога используют self.cursor, методы логов и топов — self.log_cursor
+    (оба обёрнуты InstrumentedCursor, см. instrumentation.py).
     Методы возвращают списки объектов моделей (Film, Actor, Category)
     или отдельные объекты (например, случайный фильм).
     """
-    def __init__(self, cursor):
-        self.cursor = cursor
+    search_index = SearchIndex()  # Общий для всех экземпляров поисковый индекс
+    film_sampler = FilmSampler()  # Общий кэш id фильмов для случайного выбора
+    name_resolver = NameResolver()  # Общий индекс имён актёров и категорий (свободный текст)
+    result_cache = ResultCache()  # Общий кэш списков фильмов и их количеств
+
+    def __init__(self, cursor=None, log_cursor=None):
+        self.bind(cursor, log_cursor)
+
+    def bind(self, cursor, log_cursor=None):
+        """
+        Переключает репозиторий на другой курсор
+        (в режиме сервера каждая команда выполняется на своём соединении из пула).
+        log_cursor — курсор для логов и счётчиков, если каталог читается из другого
+        источника (снимок в режиме READ_ONLY); по умолчанию — тот же cursor.
+        """
+        # Все запросы идут через self.cursor/self.log_cursor, поэтому замеряются в одном месте
+        self.cursor = self._instrument(cursor)
+        self.log_cursor = self._instrument(log_cursor) if log_cursor is not None else self.cursor
+
+    @staticmethod
+    def _instrument(cursor):
+        return InstrumentedCursor(cursor) if QUERY_STATS_ENABLED and cursor is not None else cursor
+
+    @staticmethod
+    def _list_film(row):
+        """
+        Создаёт Film из строки списка (с обрезанным описанием и жанрами через запятую).
+        """
+        film_id, title, year, description, genres = row
+        complete = description is None or len(description) <= SHORT_DESCRIPTION_LENGTH
+        genres = sorted(genres.split(",")) if genres else []
+        return Film(film_id, title, year, description, genres, description_complete=complete)
+
+    def load_description(self, film):
+        """
+        Догружает полное описание фильма, если в списке было загружено только начало.
+        """
+        if not film.description_complete:
+            self.cursor.execute("SELECT description FROM film WHERE film_id = %s", (film.film_id,))
+            row = self.cursor.fetchone()
+            film.description = row[0] if row else film.description
+            film.description_complete = True
+        return film
+
+    # --- Постраничная выборка (keyset) ---
+    @staticmethod
+    def _keyset(columns, values, after, limit):
+        """
+        Возвращает (условие, хвост запроса, параметры) для keyset-пагинации.
+        columns — столбцы ключа в порядке сортировки,
+        values — значения этих столбцов у последнего элемента предыдущей страницы (after).
+        Если after не задан, выборка начинается с начала; если limit не задан — без ограничения.
+        """
+        condition, params = "", []
+        if after is not None:
+            parts = []
+            for i, column in enumerate(columns):
+                equal = [f"{prev} = %s" for prev in columns[:i]]
+                parts.append("(" + " AND ".join(equal + [f"{column} > %s"]) + ")")
+                params.extend(values[:i + 1])
+            condition = " AND (" + " OR ".join(parts) + ")"
+        tail = " ORDER BY " + ", ".join(columns)
+        if limit is not None:
+            tail += " LIMIT %s"
+        return condition, tail, params
+
+    def _fetch_films_page(self, query, params, after=None, limit=None):
+        """
+        Выполняет запрос фильмов (с WHERE) постранично по ключу (title, film_id).
+        """
+        values = (after.title, after.film_id) if after is not None else ()
+        condition, tail, keyset_params = self._keyset(("f.title", "f.film_id"), values, after, limit)
+        params = list(params) + keyset_params
+        if limit is not None:
+            params.append(limit)
+        self.cursor.execute(query + condition + tail, tuple(params))
+        return [self._list_film(row) for row in self.cursor.fetchall()]
+
+    def _count(self, query, params):
+        """
+        Возвращает количество строк запроса (SELECT COUNT(*) ...).
+        """
+        self.cursor.execute(query, tuple(params))
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def get_catalog_version(self):
+        """
+        Возвращает версию каталога (по last_update и количеству строк, см. snapshot.py).
+        По ней сбрасывается кэш результатов.
+        """
+        return catalog_version(self.cursor)
 
     # --- Фильмы ---
-    def get_films_by_category(self, category_id):
+    @cached
+    def get_films_by_category(self, category_id, after=None, limit=None):
         """
         Возвращает список фильмов по id категории.
+        after — последний фильм предыдущей страницы, limit — размер страницы.
         """
-        self.cursor.execute("""
-            SELECT f.film_id, f.title, f.release_year, f.description, c.name
+        return self._fetch_films_page(f"""
+            SELECT {FILM_LIST_COLUMNS}
             FROM film f
             JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            WHERE c.category_id = %s
-            ORDER BY f.title
+            WHERE fc.category_id = %s
+        """, (category_id,), after, limit)
+
+    @cached
+    def count_films_by_category(self, category_id):
+        """
+        Возвращает количество фильмов в категории.
+        """
+        return self._count("""
+            SELECT COUNT(*) FROM film_category WHERE category_id = %s
         """, (category_id,))
-        return [Film(*row) for row in self.cursor.fetchall()]
 
-    def search_films(self, keyword):
+    def _search_index(self):
         """
-        Возвращает список фильмов, название которых содержит keyword.
+        Возвращает поисковый индекс. Первый раз индекс строится сразу; потом раз
+        в INDEX_TTL сверяется версия каталога, и только если она изменилась, индекс
+        перестраивается в фоне — команды тем временем ищут по старому.
         """
-        self.cursor.execute("""
-            SELECT f.film_id, f.title, f.release_year, f.description, c.name
+        index = self.search_index
+        if not index.is_built():
+            with index.build_lock:  # Параллельные сессии не строят индекс одновременно
+                if not index.is_built():
+                    version = self.get_catalog_version()
+                    self.cursor.execute("SELECT film_id, title, description FROM film")
+                    index.build(self.cursor.fetchall(), version)
+        elif index.is_stale() and index.build_lock.acquire(blocking=False):
+            # Сверяет одна сессия; остальные не ждут её и ищут по текущему индексу
+            rebuilding = False
+            try:
+                version = self.get_catalog_version()
+                if version == index.version:
+                    index.touch()
+                else:
+                    self.cursor.execute("SELECT film_id, title, description FROM film")
+                    index.rebuild_async(self.cursor.fetchall(), version)
+                    rebuilding = True
+            finally:
+                if not rebuilding:
+                    index.build_lock.release()
+        return index
+
+    def resolve(self, text):
+        """
+        Толкует свободный текст: названия фильмов, имена актёров, категории.
+        Возвращает список resolver.Match по убыванию веса. Поиск идёт по индексам
+        в памяти; БД читается, только когда индексы устарели.
+        """
+        if self.name_resolver.is_stale():
+            with self.name_resolver.build_lock:
+                if self.name_resolver.is_stale():
+                    self.cursor.execute("SELECT actor_id, first_name, last_name FROM actor")
+                    actors = [Actor(*row) for row in self.cursor.fetchall()]
+                    self.name_resolver.build(actors, self.get_categories())
+        return self.name_resolver.resolve(text, self._search_index())
+
+    def get_films_by_ids(self, film_ids):
+        """
+        Возвращает фильмы с заданными id в том же порядке, что и film_ids.
+        """
+        films = []
+        for chunk in _chunks(film_ids):
+            self.cursor.execute(f"""
+                SELECT {FILM_LIST_COLUMNS}
+                FROM film f
+                WHERE f.film_id IN ({", ".join(["%s"] * len(chunk))})
+            """, chunk)
+            films.extend(self._list_film(row) for row in self.cursor.fetchall())
+        order = {film_id: pos for pos, film_id in enumerate(film_ids)}
+        return sorted(films, key=lambda film: order[film.film_id])
+
+    @cached
+    def search_films(self, keyword, descriptions=False, after=None, limit=None):
+        """
+        Возвращает список фильмов, название которых содержит keyword
+        (или описание, если descriptions=True), по убыванию релевантности.
+        Поиск идёт по индексу в памяти, из БД загружается только нужная страница.
+        after — последний фильм предыдущей страницы, limit — размер страницы.
+        """
+        ranked, positions = self._search_index().search(keyword, descriptions)
+        start = positions.get(after.film_id, -1) + 1 if after is not None else 0
+        end = start + limit if limit is not None else len(ranked)
+        return self.get_films_by_ids(ranked[start:end])
+
+    def count_search_films(self, keyword, descriptions=False):
+        """
+        Возвращает количество фильмов, найденных search_films.
+        """
+        ranked, _ = self._search_index().search(keyword, descriptions)
+        return len(ranked)
+
+    def _resolve_filter(self, film_filter):
+        """
+        Переводит жанры и актёров фильтра в id (один раз на объект фильтра).
+        Актёры ищутся по началу имени или фамилии, чтобы использовался индекс по фамилии.
+        """
+        if film_filter.genres and film_filter.category_ids is None:
+            conditions = " OR ".join(["name LIKE %s"] * len(film_filter.genres))
+            self.cursor.execute(f"SELECT category_id FROM category WHERE {conditions}",
+                                tuple(f"%{genre}%" for genre in film_filter.genres))
+            film_filter.category_ids = [row[0] for row in self.cursor.fetchall()]
+        if film_filter.actors and film_filter.actor_ids is None:
+            conditions = " OR ".join(["last_name LIKE %s OR first_name LIKE %s"] * len(film_filter.actors))
+            params = []
+            for actor in film_filter.actors:
+                params.extend([f"{actor}%", f"{actor}%"])
+            self.cursor.execute(f"SELECT actor_id FROM actor WHERE {conditions}", tuple(params))
+            film_filter.actor_ids = [row[0] for row in self.cursor.fetchall()]
+
+    def _filter_where(self, film_filter):
+        """
+        Собирает условия WHERE и параметры для filter_films/count_filter_films.
+        Возвращает None, если жанры или актёры фильтра не нашлись (результат заведомо пуст).
+        """
+        self._resolve_filter(film_filter)
+        where = " WHERE 1=1"
+        params = []
+        if film_filter.genres:
+            if not film_filter.category_ids:
+                return None
+            # EXISTS, а не JOIN: фильм из нескольких выбранных жанров не дублируется
+            where += f"""
+                AND EXISTS (
+                    SELECT 1 FROM film_category fc
+                    WHERE fc.film_id = f.film_id
+                      AND fc.category_id IN ({', '.join(['%s'] * len(film_filter.category_ids))})
+                )"""
+            params.extend(film_filter.category_ids)
+        if film_filter.actors:
+            if not film_filter.actor_ids:
+                return None
+            where += f"""
+                AND EXISTS (
+                    SELECT 1 FROM film_actor fa
+                    WHERE fa.film_id = f.film_id
+                      AND fa.actor_id IN ({', '.join(['%s'] * len(film_filter.actor_ids))})
+                )"""
+            params.extend(film_filter.actor_ids)
+        if film_filter.years:
+            where += " AND (" + " OR ".join(["f.release_year BETWEEN %s AND %s"] * len(film_filter.years)) + ")"
+            for start, end in film_filter.years:
+                params.extend([start, end])
+        return where, params
+
+    @cached
+    def filter_films(self, film_filter, after=None, limit=None):
+        """
+        Фильтрация фильмов по жанрам, актёрам и/или годам (см. filters.FilmFilter).
+        Жанры и актёры проверяются через EXISTS по film_category и film_actor,
+        без размножения строк.
+        after — последний фильм предыдущей страницы, limit — размер страницы.
+        """
+        filter_where = self._filter_where(film_filter)
+        if filter_where is None:
+            return []
+        where, params = filter_where
+        return self._fetch_films_page(f"""
+            SELECT {FILM_LIST_COLUMNS}
             FROM film f
-            JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            WHERE f.title LIKE %s
-            ORDER BY f.title
-        """, (f"%{keyword}%",))
-        return [Film(*row) for row in self.cursor.fetchall()]
+        """ + where, params, after, limit)
 
-    def filter_films(self, genre=None, actor=None, year=None):
+    @cached
+    def count_filter_films(self, film_filter):
         """
-        Фильтрация фильмов по жанру, актёру и/или году.
-        Любой из параметров может быть None или '_', тогда фильтр не применяется.
+        Возвращает количество фильмов, подходящих под фильтр.
         """
-        query = """
-            SELECT DISTINCT f.film_id, f.title, f.release_year, f.description, c.name
+        filter_where = self._filter_where(film_filter)
+        if filter_where is None:
+            return 0
+        where, params = filter_where
+        return self._count("""
+            SELECT COUNT(*)
             FROM film f
-            JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            JOIN film_actor fa ON f.film_id = fa.film_id
-            JOIN actor a ON fa.actor_id = a.actor_id
-            WHERE 1=1
+        """ + where, params)
+
+    def _random_candidates(self, genre=None, year=None):
         """
-        params = []
-        if genre and genre != '_':
-            query += " AND c.name LIKE %s"
-            params.append(f"%{genre}%")
-        if actor and actor != '_':
-            query += " AND CONCAT(a.first_name, ' ', a.last_name) LIKE %s"
-            params.append(f"%{actor}%")
-        if year and year != '_':
-            query += " AND f.release_year = %s"
-            params.append(year)
-        query += " ORDER BY f.title"
-        self.cursor.execute(query, tuple(params))
-        return [Film(*row) for row in self.cursor.fetchall()]
+        Возвращает массив id фильмов (с категорией), подходящих под жанр и год.
+        Массив кэшируется в film_sampler.
+        """
+        key = (genre.lower() if genre else None, str(year) if year else None)
+        film_ids = self.film_sampler.get(key)
+        if film_ids is None:
+            query = """
+                SELECT DISTINCT fc.film_id
+                FROM film_category fc
+                JOIN category c ON fc.category_id = c.category_id
+                JOIN film f ON fc.film_id = f.film_id
+                WHERE 1=1
+            """
+            params = []
+            if genre:
+                query += " AND LOWER(c.name) = %s"
+                params.append(key[0])
+            if year:
+                query += " AND f.release_year = %s"
+                params.append(year)
+            self.cursor.execute(query, tuple(params))
+            film_ids = [row[0] for row in self.cursor.fetchall()]
+            self.film_sampler.put(key, film_ids)
+        return film_ids
 
-    def get_random_film(self):
+    def get_random_films(self, count=1, genre=None, year=None):
+        """
+        Возвращает до count различных случайных фильмов (одним запросом по id).
+        genre и year ограничивают выбор (None — без ограничения).
+        """
+        film_ids = self.film_sampler.sample(self._random_candidates(genre, year), count)
+        return self.get_films_by_ids(film_ids)
+
+    def get_random_film(self, genre=None, year=None):
         """
         Возвращает случайный фильм из базы.
         """
-        self.cursor.execute("""
-            SELECT f.film_id, f.title, f.release_year, f.description, c.name
-            FROM film f
-            JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            ORDER BY RAND()
-            LIMIT 1
-        """)
-        row = self.cursor.fetchone()
-        return Film(*row) if row else None
+        films = self.get_random_films(1, genre, year)
+        return films[0] if films else None
 
     # --- Актёры ---
     def get_top_actors(self, limit=10):
@@ -92,52 +371,83 @@ class Repository:
         Возвращает топ-10 актёров по количеству фильмов.
         """
         self.cursor.execute("""
-            SELECT a.first_name, a.last_name, COUNT(*) as film_count
+            SELECT a.actor_id, a.first_name, a.last_name, COUNT(*) as film_count
             FROM actor a
             JOIN film_actor fa ON a.actor_id = fa.actor_id
-            GROUP BY a.actor_id
+            GROUP BY a.actor_id, a.first_name, a.last_name
             ORDER BY film_count DESC
             LIMIT %s
         """, (limit,))
         return [Actor(*row) for row in self.cursor.fetchall()]
 
-    def get_all_actors(self):
+    def get_all_actors(self, after=None, limit=None):
         """
         Возвращает всех актёров по алфавиту.
+        after — последний актёр предыдущей страницы, limit — размер страницы.
         """
+        values = (after.last_name, after.first_name, after.actor_id) if after is not None else ()
+        condition, tail, params = self._keyset(
+            ("last_name", "first_name", "actor_id"), values, after, limit)
+        if limit is not None:
+            params.append(limit)
         self.cursor.execute("""
-            SELECT first_name, last_name FROM actor ORDER BY last_name, first_name
-        """)
-        return [Actor(first, last) for first, last in self.cursor.fetchall()]
+            SELECT actor_id, first_name, last_name FROM actor WHERE 1=1
+        """ + condition + tail, tuple(params))
+        return [Actor(*row) for row in self.cursor.fetchall()]
+
+    def count_actors(self):
+        """
+        Возвращает количество актёров.
+        """
+        return self._count("SELECT COUNT(*) FROM actor", ())
 
     def get_actors_by_film_id(self, film_id):
         """
         Возвращает список актёров для заданного фильма.
         """
-        self.cursor.execute("""
-            SELECT a.first_name, a.last_name
-            FROM actor a
-            JOIN film_actor fa ON a.actor_id = fa.actor_id
-            WHERE fa.film_id = %s
-            ORDER BY a.last_name, a.first_name
-        """, (film_id,))
-        return [Actor(first, last) for first, last in self.cursor.fetchall()]
+        return self.get_actors_for_films([film_id])[film_id]
 
-    def get_films_by_actor(self, actor_name):
+    def get_actors_for_films(self, film_ids):
         """
-        Возвращает список фильмов, в которых снимался актёр (по имени).
+        Возвращает актёров сразу нескольких фильмов одним запросом:
+        словарь film_id -> список актёров (пустой, если актёров нет).
         """
-        self.cursor.execute("""
-            SELECT f.film_id, f.title, f.release_year, f.description, c.name
-            FROM film f
-            JOIN film_actor fa ON f.film_id = fa.film_id
-            JOIN actor a ON fa.actor_id = a.actor_id
-            JOIN film_category fc ON f.film_id = fc.film_id
-            JOIN category c ON fc.category_id = c.category_id
-            WHERE CONCAT(a.first_name, ' ', a.last_name) LIKE %s
-            ORDER BY f.title
-        """, (f"%{actor_name}%",))
-        return [Film(*row) for row in self.cursor.fetchall()]
+        casts = {film_id: [] for film_id in film_ids}
+        for chunk in _chunks(list(casts)):
+            self.cursor.execute(f"""
+                SELECT fa.film_id, a.actor_id, a.first_name, a.last_name
+                FROM film_actor fa
+                JOIN actor a ON a.actor_id = fa.actor_id
+                WHERE fa.film_id IN ({", ".join(["%s"] * len(chunk))})
+                ORDER BY fa.film_id, a.last_name, a.first_name
+            """, chunk)
+            for film_id, *actor in self.cursor.fetchall():
+                casts[film_id].append(Actor(*actor))
+        return casts
+
+    @cached
+    def get_films_by_actor_id(self, actor_id, after=None, limit=None):
+        """
+        Возвращает список фильмов актёра по его id (через индекс film_actor).
+        after — последний фильм предыдущей страницы, limit — размер страницы.
+        """
+        return self._fetch_films_page(f"""
+            SELECT {FILM_LIST_COLUMNS}
+            FROM film_actor fa
+            JOIN film f ON fa.film_id = f.film_id
+            WHERE fa.actor_id = %s
+        """, (actor_id,), after, limit)
+
+    @cached
+    def count_films_by_actor_id(self, actor_id):
+        """
+        Возвращает количество фильмов актёра по его id.
+        """
+        return self._count("""
+            SELECT COUNT(*)
+            FROM film_actor fa
+            WHERE fa.actor_id = %s
+        """, (actor_id,))
 
     # --- Категории ---
     def get_categories(self):
@@ -147,65 +457,241 @@ class Repository:
         self.cursor.execute("SELECT category_id, name FROM category ORDER BY name")
         return [Category(cat_id, name) for cat_id, name in self.cursor.fetchall()]
 
+    # --- Версия схемы (schema.py) ---
+    def create_schema_version_table(self):
+        """
+        Создаёт таблицу с версией схемы БД, если не существует.
+        """
+        self.log_cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT NOT NULL
+            )
+        """)
+
+    def get_schema_version(self):
+        """
+        Возвращает версию схемы БД (0, если миграции ещё не применялись).
+        """
+        self.log_cursor.execute("SELECT MAX(version) FROM schema_version")
+        version = self.log_cursor.fetchone()[0]
+        return int(version) if version is not None else 0
+
+    def set_schema_version(self, version):
+        """
+        Записывает версию схемы БД (в таблице всегда одна строка).
+        """
+        self.log_cursor.execute("DELETE FROM schema_version")
+        self.log_cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
+
     # --- Логирование и топы ---
     def create_search_log_table(self):
         """
         Создаёт таблицу логов поисковых запросов, если не существует.
         """
-        self.cursor.execute("""
+        self.log_cursor.execute("""
             CREATE TABLE IF NOT EXISTS student_search_log (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 search_query VARCHAR(255) NOT NULL,
-                search_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                search_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                KEY idx_student_search_log_time (search_time),
+                KEY idx_student_search_log_query (search_query)
             )
         """)
+        self._create_index("student_search_log", "idx_student_search_log_time", "search_time")
+        self._create_index("student_search_log", "idx_student_search_log_query", "search_query")
 
     def create_command_log_table(self):
         """
         Создаёт таблицу логов всех команд, если не существует.
         """
-        self.cursor.execute("""
+        self.log_cursor.execute("""
             CREATE TABLE IF NOT EXISTS all_command_log (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 command_text VARCHAR(255),
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                KEY idx_all_command_log_time (timestamp),
+                KEY idx_all_command_log_text (command_text)
             )
         """)
+        self._create_index("all_command_log", "idx_all_command_log_time", "timestamp")
+        self._create_index("all_command_log", "idx_all_command_log_text", "command_text")
 
-    def log_search(self, query):
+    def _create_index(self, table, name, column):
         """
-        Записывает поисковый запрос в лог.
+        Добавляет индекс в уже существующую таблицу логов (таблицы, созданные
+        до появления индексов). Если индекс уже есть, ничего не делает.
         """
-        self.cursor.execute("INSERT INTO student_search_log (search_query) VALUES (%s)", (query,))
+        try:
+            self.log_cursor.execute(f"CREATE INDEX {name} ON {table} ({column})")
+        except Exception as e:
+            if getattr(e, "errno", None) != DUPLICATE_KEY_NAME:
+                raise
 
-    def log_command(self, command):
+    def create_stats_tables(self):
         """
-        Записывает команду пользователя в лог.
+        Создаёт таблицы счётчиков для топов команд и запросов, если их нет:
+        общие (*_stats) и по дням (*_daily_stats). Пустые таблицы один раз
+        заполняются из уже накопленных логов.
         """
-        self.cursor.execute("INSERT INTO all_command_log (command_text) VALUES (%s)", (command,))
+        for stats, key in (("all_command", "command_text"), ("student_search", "search_query")):
+            self.log_cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {stats}_stats (
+                    {key} VARCHAR(255) NOT NULL PRIMARY KEY,
+                    hits INT NOT NULL,
+                    KEY idx_{stats}_stats_hits (hits)
+                )
+            """)
+            self.log_cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {stats}_daily_stats (
+                    stat_day DATE NOT NULL,
+                    {key} VARCHAR(255) NOT NULL,
+                    hits INT NOT NULL,
+                    PRIMARY KEY (stat_day, {key})
+                )
+            """)
+        self.log_cursor.execute("SELECT 1 FROM all_command_stats LIMIT 1")
+        if self.log_cursor.fetchone() is None:
+            self.rollup_stats()
 
-    def get_top_queries(self, limit=10):
+    def rollup_stats(self):
+        """
+        Пересчитывает таблицы счётчиков из сырых логов.
+        Дни, сырые логи которых уже удалены обслуживанием (maintenance.py),
+        остаются в *_daily_stats как есть и входят в общие счётчики.
+        """
+        for log_table, stats, key, time_column in LOG_TABLES:
+            first_day = self._first_log_day(log_table, time_column)
+            if first_day is not None:
+                self.log_cursor.execute(f"DELETE FROM {stats}_daily_stats WHERE stat_day >= %s", (first_day,))
+                self.log_cursor.execute(f"""
+                    INSERT INTO {stats}_daily_stats (stat_day, {key}, hits)
+                    SELECT DATE({time_column}), {key}, COUNT(*)
+                    FROM {log_table}
+                    WHERE {key} IS NOT NULL
+                    GROUP BY DATE({time_column}), {key}
+                """)
+            self.log_cursor.execute(f"DELETE FROM {stats}_stats")
+            self.log_cursor.execute(f"""
+                INSERT INTO {stats}_stats ({key}, hits)
+                SELECT {key}, SUM(hits) FROM {stats}_daily_stats GROUP BY {key}
+            """)
+
+    def _first_log_day(self, log_table, time_column):
+        """
+        Возвращает самый ранний день в сырых логах (None, если таблица пуста).
+        """
+        self.log_cursor.execute(f"SELECT DATE(MIN({time_column})) FROM {log_table}")
+        return self.log_cursor.fetchone()[0]
+
+    def rollup_log_days(self, log_table, stats, key, time_column, before):
+        """
+        Пересчитывает *_daily_stats за дни раньше before, сырые логи которых ещё
+        есть, чтобы после их удаления в счётчиках по дням не пропало ничего
+        (например, записей, накопленных до появления счётчиков).
+        Возвращает количество пересчитанных строк счётчиков.
+        """
+        first_day = self._first_log_day(log_table, time_column)
+        if first_day is None:
+            return 0
+        self.log_cursor.execute(f"""
+            DELETE FROM {stats}_daily_stats WHERE stat_day >= %s AND stat_day < %s
+        """, (first_day, before))
+        self.log_cursor.execute(f"""
+            INSERT INTO {stats}_daily_stats (stat_day, {key}, hits)
+            SELECT DATE({time_column}), {key}, COUNT(*)
+            FROM {log_table}
+            WHERE {time_column} < %s AND {key} IS NOT NULL
+            GROUP BY DATE({time_column}), {key}
+        """, (before,))
+        return self.log_cursor.rowcount
+
+    def get_log_id_range(self, log_table, time_column, before):
+        """
+        Возвращает (первый id, последний id, количество) записей лога раньше before.
+        """
+        self.log_cursor.execute(f"""
+            SELECT MIN(id), MAX(id), COUNT(*) FROM {log_table} WHERE {time_column} < %s
+        """, (before,))
+        first_id, last_id, count = self.log_cursor.fetchone()
+        return first_id, last_id, int(count)
+
+    def purge_log_range(self, log_table, time_column, before, first_id, last_id):
+        """
+        Удаляет записи лога раньше before с id в диапазоне [first_id, last_id].
+        Возвращает количество удалённых строк.
+        """
+        self.log_cursor.execute(f"""
+            DELETE FROM {log_table} WHERE id BETWEEN %s AND %s AND {time_column} < %s
+        """, (first_id, last_id, before))
+        return self.log_cursor.rowcount
+
+    def _bump_stats(self, stats, key, entries):
+        """
+        Прибавляет записи (текст, время) к счётчикам таблиц {stats}_stats и {stats}_daily_stats.
+        """
+        totals, daily = Counter(), Counter()
+        for text, at in entries:
+            totals[text] += 1
+            daily[(at.date(), text)] += 1
+        self.log_cursor.executemany(f"""
+            INSERT INTO {stats}_stats ({key}, hits) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE hits = hits + VALUES(hits)
+        """, list(totals.items()))
+        self.log_cursor.executemany(f"""
+            INSERT INTO {stats}_daily_stats (stat_day, {key}, hits) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE hits = hits + VALUES(hits)
+        """, [(day, text, hits) for (day, text), hits in daily.items()])
+
+    def log_searches(self, entries):
+        """
+        Записывает пачку поисковых запросов одним executemany и обновляет счётчики.
+        Аргументы:
+            entries: список кортежей (запрос, время)
+        """
+        self.log_cursor.executemany(
+            "INSERT INTO student_search_log (search_query, search_time) VALUES (%s, %s)", entries)
+        self._bump_stats("student_search", "search_query", entries)
+
+    def log_commands(self, entries):
+        """
+        Записывает пачку команд одним executemany и обновляет счётчики.
+        Аргументы:
+            entries: список кортежей (команда, время)
+        """
+        self.log_cursor.executemany(
+            "INSERT INTO all_command_log (command_text, timestamp) VALUES (%s, %s)", entries)
+        self._bump_stats("all_command", "command_text", entries)
+
+    def _get_top(self, stats, key, limit, since):
+        """
+        Возвращает топ [(текст, количество)] из таблиц счётчиков.
+        since — дата, начиная с которой считать (None — за всё время).
+        """
+        if since is None:
+            self.log_cursor.execute(f"""
+                SELECT {key}, hits FROM {stats}_stats ORDER BY hits DESC LIMIT %s
+            """, (limit,))
+        else:
+            self.log_cursor.execute(f"""
+                SELECT {key}, SUM(hits) AS total
+                FROM {stats}_daily_stats
+                WHERE stat_day >= %s
+                GROUP BY {key}
+                ORDER BY total DESC
+                LIMIT %s
+            """, (since, limit))
+        return [(text, int(count)) for text, count in self.log_cursor.fetchall()]
+
+    def get_top_queries(self, limit=10, since=None):
         """
         Возвращает топ поисковых запросов.
+        since — дата, начиная с которой считать (None — за всё время).
         """
-        self.cursor.execute("""
-            SELECT search_query
-            FROM student_search_log
-            GROUP BY search_query
-            ORDER BY COUNT(*) DESC
-            LIMIT %s
-        """, (limit,))
-        return [row[0] for row in self.cursor.fetchall()]
+        return [text for text, _ in self._get_top("student_search", "search_query", limit, since)]
 
-    def get_top_commands(self, limit=15):
+    def get_top_commands(self, limit=15, since=None):
         """
-        Возвращает топ команд пользователя.
+        Возвращает топ команд пользователя: список кортежей (команда, количество).
+        since — дата, начиная с которой считать (None — за всё время).
         """
-        self.cursor.execute("""
-            SELECT command_text, COUNT(*) as count
-            FROM all_command_log
-            GROUP BY command_text
-            ORDER BY count DESC
-            LIMIT %s
-        """, (limit,))
-        return list(self.cursor.fetchall())
+        return self._get_top("all_command", "command_text", limit, since)
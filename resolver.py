@@ -0,0 +1,98 @@
+# Разбор свободного текста (ввод, который не является командой).
+# NameResolver держит в памяти имена актёров (в триграммном SearchIndex) и
+# названия категорий, поэтому ввод проверяется по названиям фильмов, актёрам и
+# категориям без запросов к БД. Результат — список Match по убыванию веса.
+# Используется Repository.resolve и Navigator (main.py).
+
+import threading
+import time
+
+from search import SearchIndex, normalize, INDEX_TTL
+
+# Веса совпадений: точное совпадение важнее частичного,
+# среди частичных названия фильмов важнее имён актёров (как было раньше)
+SCORE_CATEGORY = 100
+SCORE_EXACT_TITLE = 95
+SCORE_EXACT_ACTOR = 90
+SCORE_TITLES = 50
+SCORE_ACTORS = 40
+SCORE_CATEGORY_PART = 30
+
+class Match:
+    """
+    Одно толкование введённого текста.
+    Аргументы конструктора:
+        kind: str — 'title' (фильмы по названию), 'actor' (один актёр),
+            'actors' (несколько актёров), 'category' (жанр)
+        score: int — вес совпадения
+        target: Category для 'category', Actor для 'actor', список Actor для 'actors',
+            None для 'title'
+        total: int — сколько фильмов нашлось по названию (для 'title')
+    """
+    __slots__ = ("kind", "score", "target", "total")
+
+    def __init__(self, kind, score, target=None, total=0):
+        self.kind = kind
+        self.score = score
+        self.target = target
+        self.total = total
+
+class NameResolver:
+    """
+    Индекс имён актёров и категорий в памяти.
+    Аргументы конструктора:
+        ttl: int — время жизни индекса в секундах
+    """
+    def __init__(self, ttl=INDEX_TTL):
+        self.ttl = ttl
+        self.built_at = None
+        self.build_lock = threading.Lock()
+        self._actor_index = SearchIndex(ttl)
+        self._actors = {}  # actor_id -> Actor
+        self._categories = []
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    def build(self, actors, categories):
+        """
+        Строит индекс заново.
+        Аргументы:
+            actors: список Actor
+            categories: список Category
+        """
+        self._actor_index.build((actor.actor_id, actor.full_name(), "") for actor in actors)
+        self._actors = {actor.actor_id: actor for actor in actors}
+        self._categories = list(categories)
+        self.built_at = time.monotonic()
+
+    def resolve(self, text, title_index):
+        """
+        Возвращает список Match по убыванию веса (пустой, если ничего не нашлось).
+        title_index — поисковый индекс фильмов (SearchIndex).
+        """
+        phrase = normalize(text)
+        if not phrase:
+            return []
+        matches = []
+        for category in self._categories:
+            name = normalize(category.name)
+            if name == phrase:
+                matches.append(Match('category', SCORE_CATEGORY, category))
+            elif phrase in name:
+                matches.append(Match('category', SCORE_CATEGORY_PART, category))
+        ranked, _ = title_index.search(phrase)
+        if ranked:
+            exact = title_index.title(ranked[0]) == phrase
+            matches.append(Match('title', SCORE_EXACT_TITLE if exact else SCORE_TITLES, total=len(ranked)))
+        actor_ids, _ = self._actor_index.search(phrase)
+        actors = [self._actors[actor_id] for actor_id in actor_ids]
+        exact = [actor for actor in actors if normalize(actor.full_name()) == phrase]
+        if len(exact) == 1:
+            matches.append(Match('actor', SCORE_EXACT_ACTOR, exact[0]))
+        elif len(actors) == 1:
+            matches.append(Match('actor', SCORE_ACTORS, actors[0]))
+        elif actors:
+            matches.append(Match('actors', SCORE_ACTORS, actors))
+        matches.sort(key=lambda match: -match.score)
+        return matches
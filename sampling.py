@@ -0,0 +1,57 @@
+# Случайный выбор фильмов без ORDER BY RAND().
+# FilmSampler хранит в памяти массивы id подходящих фильмов (отдельно для каждого
+# сочетания жанр/год) и выбирает из них случайные id за O(1) на фильм.
+# Массивы перечитываются из БД раз в SAMPLER_TTL секунд; ключи задаёт ввод пользователя,
+# поэтому хранится не больше SAMPLER_MAX_KEYS массивов (давно не использованные вытесняются).
+# Используется Repository.
+
+import random
+import threading
+import time
+from collections import OrderedDict
+
+SAMPLER_TTL = 300  # Через сколько секунд массив id перечитывается из БД
+SAMPLER_MAX_KEYS = 64  # Сколько сочетаний жанр/год хранить
+
+class FilmSampler:
+    """
+    Кэш массивов id фильмов для случайного выбора.
+    Аргументы конструктора:
+        ttl: float — время жизни массива в секундах
+        max_keys: int — сколько массивов хранить
+    """
+    def __init__(self, ttl=SAMPLER_TTL, max_keys=SAMPLER_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._ids = OrderedDict()  # ключ (жанр, год) -> (время загрузки, [film_id])
+        self._lock = threading.Lock()  # Кэш общий для всех сессий сервера
+
+    def get(self, key):
+        """
+        Возвращает массив id по ключу или None, если его нет или он устарел.
+        """
+        with self._lock:
+            entry = self._ids.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self._ids.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, film_ids):
+        """
+        Сохраняет массив id по ключу.
+        """
+        with self._lock:
+            self._ids[key] = (time.monotonic(), list(film_ids))
+            self._ids.move_to_end(key)
+            while len(self._ids) > self.max_keys:
+                self._ids.popitem(last=False)
+
+    @staticmethod
+    def sample(film_ids, count):
+        """
+        Возвращает до count различных случайных id из массива.
+        """
+        if count == 1:
+            return [random.choice(film_ids)] if film_ids else []
+        return random.sample(film_ids, min(count, len(film_ids)))
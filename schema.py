@@ -0,0 +1,92 @@
+# Версия схемы БД и миграции (таблицы логов, счётчиков и служебные таблицы;
+# таблицы каталога не меняются).
+# В таблице schema_version одна строка с номером последней применённой миграции.
+# ensure_schema при запуске сначала смотрит локальный файл SCHEMA_CACHE_PATH: если
+# для этой БД там записана текущая версия, к БД не обращается вовсе. Иначе читает
+# версию из БД, применяет недостающие миграции и запоминает результат.
+# Новая миграция — функция от Repository, добавленная в конец MIGRATIONS.
+# Миграции должны быть безопасны при повторном запуске (несколько процессов могут
+# применять их одновременно, а у старых установок таблицы уже есть).
+# Используется main.py, batch.py, server.py, maintenance.py и bench.py.
+# Модули БД и config импортируются в ensure_schema: main.py читает SCHEMA_VERSION
+# для --version до загрузки остальных модулей.
+
+import json
+import os
+
+def _create_log_tables(repo):
+    """
+    Таблицы логов (с индексами) и счётчиков для топов.
+    """
+    repo.create_search_log_table()
+    repo.create_command_log_table()
+    repo.create_stats_tables()
+
+# Миграции по порядку: (версия, функция(repo))
+MIGRATIONS = [
+    (1, _create_log_tables),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]  # Версия схемы, которую ожидает код
+
+def migrate(repo):
+    """
+    Применяет к БД недостающие миграции. Возвращает версию схемы после них.
+    """
+    repo.create_schema_version_table()
+    version = repo.get_schema_version()
+    for target, migration in MIGRATIONS:
+        if target > version:
+            migration(repo)
+            repo.set_schema_version(target)
+            version = target
+    return version
+
+def database_key(config):
+    """
+    Возвращает строку, по которой БД различаются в файле кэша версий.
+    """
+    if config.get("backend") == "sqlite":
+        return "sqlite:" + os.path.abspath(config["path"])
+    return f"mysql:{config.get('host')}:{config.get('port')}/{config.get('database')}"
+
+def _read_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_cache(path, key, version):
+    cache = _read_cache(path)
+    cache[key] = version
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # Нет прав на запись — проверим версию в следующий раз
+
+def ensure_schema(session_factory=None, config=None, cache_path=None):
+    """
+    Приводит схему БД к SCHEMA_VERSION, если это ещё не сделано.
+    Аргументы:
+        session_factory: контекстный менеджер, выдающий курсор (по умолчанию db_session)
+        config: dict — параметры БД для ключа в кэше версий (по умолчанию DB_CONFIG)
+        cache_path: str — файл кэша версий (по умолчанию SCHEMA_CACHE_PATH; пустая строка — без кэша)
+    Возвращает версию схемы.
+    """
+    from db import db_session
+    from repository import Repository
+    from config import DB_CONFIG, SCHEMA_CACHE_PATH
+    session_factory = session_factory or db_session
+    config = config or DB_CONFIG
+    cache_path = SCHEMA_CACHE_PATH if cache_path is None else cache_path
+    key = database_key(config)
+    if cache_path and _read_cache(cache_path).get(key) == SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    with session_factory() as cursor:
+        version = migrate(Repository(cursor))
+    if cache_path and version >= SCHEMA_VERSION:
+        _write_cache(cache_path, key, version)
+    return version
@@ -0,0 +1,195 @@
+# Поиск фильмов по названию и описанию.
+# SearchIndex строится в памяти из каталога (film_id, title, description)
+# и хранит триграммный индекс: поиск подстроки не просматривает всю таблицу film,
+# а пересекает короткие списки кандидатов. Результаты ранжируются по релевантности.
+# Индекс по описаниям строится только при первом поиске с -d.
+# Раз в INDEX_TTL секунд Repository сверяет версию каталога; если она изменилась,
+# индекс перестраивается в фоновом потоке, а поиск до замены идёт по старому.
+# Используется Repository.search_films.
+
+import threading
+import time
+from collections import OrderedDict
+
+INDEX_TTL = 300  # Через сколько секунд сверять индекс с версией каталога
+RESULT_CACHE_SIZE = 64  # Сколько последних запросов хранить (для постраничного вывода)
+
+def normalize(text):
+    """
+    Приводит строку к нижнему регистру и схлопывает пробелы.
+    """
+    return " ".join((text or "").lower().split())
+
+def trigrams(text):
+    """
+    Возвращает множество триграмм строки.
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SearchIndex:
+    """
+    Триграммный индекс по названиям и описаниям фильмов.
+    Аргументы конструктора:
+        ttl: int — время жизни индекса в секундах
+    """
+    def __init__(self, ttl=INDEX_TTL):
+        self.ttl = ttl
+        self.built_at = None  # Когда индекс построен или последний раз сверен с каталогом
+        self.version = None  # Версия каталога, по которой построен индекс
+        self._titles = {}  # film_id -> нормализованное название
+        self._descriptions = {}  # film_id -> нормализованное описание
+        self._title_grams = {}  # триграмма -> set(film_id)
+        self._description_grams = None  # Строится при первом поиске по описаниям
+        self._results = OrderedDict()  # (запрос, descriptions) -> (список id, позиции)
+        self._lock = threading.Lock()  # Индекс общий для всех сессий сервера
+        self._description_lock = threading.Lock()
+        # Держится на время построения; фоновое перестроение отпускает его само (см. rebuild_async)
+        self.build_lock = threading.Lock()
+
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_stale(self):
+        """
+        Возвращает True, если индекс ещё не построен или пора сверить его с каталогом.
+        """
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    def touch(self):
+        """
+        Отмечает, что каталог не изменился: следующая сверка — через ttl.
+        """
+        self.built_at = time.monotonic()
+
+    def build(self, rows, version=None):
+        """
+        Строит индекс заново.
+        Аргументы:
+            rows: итерируемое кортежей (film_id, title, description)
+            version: версия каталога, по которой построен индекс
+        """
+        titles, descriptions, title_grams = {}, {}, {}
+        for film_id, title, description in rows:
+            titles[film_id] = normalize(title)
+            descriptions[film_id] = normalize(description)
+            for gram in trigrams(titles[film_id]):
+                title_grams.setdefault(gram, set()).add(film_id)
+        with self._lock:
+            self._titles, self._descriptions = titles, descriptions
+            self._title_grams, self._description_grams = title_grams, None
+            self._results.clear()
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def rebuild_async(self, rows, version=None):
+        """
+        Перестраивает индекс в фоновом потоке; до замены поиск идёт по старому индексу.
+        Вызывающий код должен держать build_lock — поток отпустит его по завершении.
+        """
+        def run():
+            try:
+                self.build(rows, version)
+            finally:
+                self.build_lock.release()
+        threading.Thread(target=run, name="reeldeal-search-index", daemon=True).start()
+
+    def _description_index(self, descriptions):
+        """
+        Возвращает триграммный индекс описаний, строя его при первом обращении.
+        """
+        with self._description_lock:
+            with self._lock:
+                if self._descriptions is descriptions and self._description_grams is not None:
+                    return self._description_grams
+            grams = {}
+            for film_id, text in descriptions.items():
+                for gram in trigrams(text):
+                    grams.setdefault(gram, set()).add(film_id)
+            with self._lock:
+                if self._descriptions is descriptions:  # Индекс не перестроили, пока строились описания
+                    self._description_grams = grams
+            return grams
+
+    def title(self, film_id):
+        """
+        Возвращает нормализованное название фильма по id (None, если его нет в индексе).
+        """
+        return self._titles.get(film_id)
+
+    @staticmethod
+    def _lookup(term, texts, grams_index):
+        """
+        Возвращает множество id, в текстах которых встречается подстрока term.
+        Короткие (меньше трёх символов) термы проверяются перебором текстов в памяти.
+        """
+        grams = trigrams(term)
+        if not grams:
+            return {film_id for film_id, text in texts.items() if term in text}
+        postings = sorted((grams_index.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return {film_id for film_id in candidates if term in texts[film_id]}
+
+    @staticmethod
+    def _score(title, description, phrase, terms):
+        """
+        Оценка релевантности: совпадение всей фразы в названии важнее
+        совпадения отдельных слов, совпадение в названии важнее описания.
+        """
+        words = title.split()
+        score = 0
+        if title == phrase:
+            score += 20
+        elif title.startswith(phrase):
+            score += 10
+        elif phrase in title:
+            score += 5
+        for term in terms:
+            if any(word.startswith(term) for word in words):
+                score += 3
+            elif term in title:
+                score += 2
+            elif term in description:
+                score += 1
+        return score
+
+    def search(self, query, descriptions=False):
+        """
+        Возвращает (список id фильмов по убыванию релевантности, словарь id -> позиция).
+        Фильм подходит, если каждое слово запроса встречается в названии
+        (или в описании, если descriptions=True).
+        """
+        phrase = normalize(query)
+        key = (phrase, descriptions)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+            # Одно согласованное состояние индекса на весь поиск (его может заменить перестроение)
+            titles, texts, title_grams = self._titles, self._descriptions, self._title_grams
+        description_grams = self._description_index(texts) if descriptions else None
+        terms = phrase.split()
+        if not terms:
+            matched = set(titles)
+        else:
+            matched = None
+            for term in terms:
+                found = self._lookup(term, titles, title_grams)
+                if descriptions:
+                    found |= self._lookup(term, texts, description_grams)
+                matched = found if matched is None else matched & found
+                if not matched:
+                    break
+        ranked = sorted(matched, key=lambda film_id: (
+            -self._score(titles[film_id], texts[film_id], phrase, terms), titles[film_id], film_id))
+        result = (ranked, {film_id: pos for pos, film_id in enumerate(ranked)})
+        with self._lock:
+            if self._titles is not titles:
+                return result  # Индекс перестроен во время поиска — не кэшируем
+            self._results[key] = result
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return result
@@ -0,0 +1,153 @@
+# Сетевой режим: один процесс обслуживает много пользователей.
+# Протокол строковый: клиент присылает по команде в строке (те же команды, что и
+# в интерактивном режиме), сервер отвечает одной строкой JSON на команду
+# (формат как в batch.py). Состояние навигации (стек возврата, хлебные крошки,
+# пагинатор) хранится на сервере отдельно для каждого подключения.
+# Соединения с БД, поисковый индекс, кэш случайного выбора, топ команд и запись
+# логов общие для всех клиентов. Запросы к БД выполняются в пуле потоков,
+# соединение из пула берётся только на время одной команды.
+#
+# Запуск:
+#   python server.py --port 8765
+#   printf 'search ace\n1\n' | nc 127.0.0.1 8765
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from db import db_session, get_pool
+from repository import Repository
+from logwriter import LogWriter
+from main import Navigator, top_commands_counter
+from schema import ensure_schema
+from prefetch import Prefetcher
+from batch import JsonView, run_command, to_json
+from snapshot import catalog_factory
+from config import SERVER_HOST, SERVER_PORT, SERVER_MAX_CLIENTS, SERVER_IDLE_TIMEOUT, SERVER_WORKERS
+from config import PREFETCH_ENABLED
+
+MAX_LINE = 4096  # Максимальная длина команды, байт
+
+class ClientSession:
+    """
+    Состояние одного подключения: свой Navigator и Repository,
+    общие для сервера журнал, топ команд и фоновая подгрузка.
+    Аргументы конструктора:
+        server: Server
+    """
+    def __init__(self, server):
+        self.server = server
+        self.view = JsonView()
+        self.navigator = Navigator(Repository(), server.log_writer, server.top_commands, view=self.view,
+                                   prefetcher=server.prefetcher, session_factory=server.catalog_factory)
+
+    def execute(self, cmd):
+        """
+        Выполняет команду на соединении из пула (вызывается в потоке пула).
+        Возвращает (запись для JSON, продолжать ли работу).
+        """
+        return run_command(self.navigator, self.view, cmd)
+
+class Server:
+    """
+    Асинхронный сервер команд.
+    Аргументы конструктора:
+        session_factory: контекстный менеджер, выдающий курсор (по умолчанию db_session)
+        catalog_factory: то же для чтения каталога (по умолчанию session_factory;
+            в режиме READ_ONLY main() передаёт снимок)
+        max_clients: int — сколько подключений обслуживать одновременно
+        idle_timeout: float — через сколько секунд простоя отключать клиента
+        workers: int — сколько команд выполнять с БД одновременно
+            (не больше размера пула за вычетом соединений для журнала и топа)
+    """
+    def __init__(self, session_factory=db_session, catalog_factory=None, max_clients=SERVER_MAX_CLIENTS,
+                 idle_timeout=SERVER_IDLE_TIMEOUT, workers=SERVER_WORKERS):
+        self.session_factory = session_factory
+        self.catalog_factory = catalog_factory or session_factory
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reeldeal-db")
+        self.log_writer = LogWriter(session_factory=session_factory)
+        self.top_commands = top_commands_counter(session_factory)
+        self.prefetcher = Prefetcher(session_factory=self.catalog_factory) if PREFETCH_ENABLED else None
+        self.clients = 0
+
+    def prepare(self):
+        """
+        Готовит схему и запускает запись логов.
+        """
+        ensure_schema(self.session_factory)
+        self.log_writer.start()
+
+    async def handle_client(self, reader, writer):
+        """
+        Обслуживает одно подключение до exit, разрыва или простоя.
+        """
+        if self.clients >= self.max_clients:
+            writer.write((to_json({"error": "Сервер перегружен, попробуйте позже."}) + "\n").encode())
+            await writer.drain()
+            writer.close()
+            return
+        self.clients += 1
+        session = ClientSession(self)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except (asyncio.TimeoutError, ValueError):  # ValueError — слишком длинная строка
+                    break
+                if not line:
+                    break
+                cmd = line.decode("utf-8", errors="replace").strip()
+                if not cmd:
+                    continue
+                record, keep_going = await loop.run_in_executor(self.executor, session.execute, cmd)
+                writer.write((to_json(record) + "\n").encode())
+                await writer.drain()
+                if not keep_going:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        """
+        Принимает подключения, пока задача не будет отменена.
+        """
+        server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        self.log_writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Сетевой режим ReelDeal (строковый протокол, ответы — JSON)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+
+    try:
+        catalog = catalog_factory()
+    except RuntimeError as e:
+        print(to_json({"error": str(e)}))
+        raise SystemExit(1)
+    server = Server(catalog_factory=catalog)
+    server.prepare()
+    print(f"ReelDeal слушает {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        get_pool().close()
+
+if __name__ == "__main__":
+    main()
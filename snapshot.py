@@ -0,0 +1,134 @@
+# Снимок каталога в локальном файле SQLite.
+# Таблицы каталога (film, actor, category, film_actor, film_category) меняются редко,
+# поэтому их можно выгрузить в файл и читать оттуда (режим READ_ONLY): чтение каталога
+# не ходит в MySQL, туда пишутся только логи и счётчики. Версия снимка — количество
+# строк и максимальный last_update по таблицам каталога; если она не изменилась,
+# повторная выгрузка не нужна.
+#
+# Запуск:
+#   python snapshot.py              # выгрузить, если каталог изменился
+#   python snapshot.py --force      # выгрузить в любом случае
+#   READ_ONLY=1 python main.py      # работать по снимку
+
+import argparse
+import os
+from datetime import datetime
+
+from db import db_session, read_session
+from sqlite_db import connect, session_factory
+from config import SNAPSHOT_PATH, READ_ONLY
+
+# Схема каталога в SQLite (с индексами как в Sakila). Используется и бенчмарком.
+CATALOG_SCHEMA = """
+    CREATE TABLE category (category_id INTEGER PRIMARY KEY, name TEXT NOT NULL,
+        last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE film (film_id INTEGER PRIMARY KEY, title TEXT NOT NULL, description TEXT,
+        release_year INT, last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE INDEX idx_title ON film (title);
+    CREATE TABLE actor (actor_id INTEGER PRIMARY KEY, first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL, last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE INDEX idx_actor_last_name ON actor (last_name);
+    CREATE TABLE film_actor (actor_id INT NOT NULL, film_id INT NOT NULL,
+        last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (actor_id, film_id));
+    CREATE INDEX idx_fk_film_id ON film_actor (film_id);
+    CREATE TABLE film_category (film_id INT NOT NULL, category_id INT NOT NULL,
+        last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (film_id, category_id));
+    CREATE INDEX fk_film_category_category ON film_category (category_id);
+"""
+
+CATALOG_TABLES = {  # Таблица -> выгружаемые столбцы
+    "category": ("category_id", "name", "last_update"),
+    "film": ("film_id", "title", "description", "release_year", "last_update"),
+    "actor": ("actor_id", "first_name", "last_name", "last_update"),
+    "film_actor": ("actor_id", "film_id", "last_update"),
+    "film_category": ("film_id", "category_id", "last_update"),
+}
+EXPORT_BATCH_SIZE = 5000  # Сколько строк читать из MySQL за раз
+
+def catalog_version(cursor):
+    """
+    Возвращает версию каталога в БД: максимальный last_update и количество строк по таблицам.
+    """
+    counts, latest = [], None
+    for table in CATALOG_TABLES:
+        cursor.execute(f"SELECT COUNT(*), MAX(last_update) FROM {table}")
+        count, last_update = cursor.fetchone()
+        counts.append(str(count))
+        if last_update is not None and (latest is None or str(last_update) > latest):
+            latest = str(last_update)
+    return f"{latest}/{'/'.join(counts)}"
+
+def read_snapshot_info(path=SNAPSHOT_PATH):
+    """
+    Возвращает {'version': ..., 'exported_at': ...} снимка или None, если снимка нет.
+    """
+    if not os.path.exists(path):
+        return None
+    conn = connect(path, read_only=True)
+    try:
+        return dict(conn.execute("SELECT key, value FROM snapshot_meta").fetchall())
+    finally:
+        conn.close()
+
+def export_snapshot(cursor, path=SNAPSHOT_PATH):
+    """
+    Выгружает каталог из MySQL (cursor) в файл SQLite. Файл заменяется целиком
+    после успешной выгрузки, поэтому читатели никогда не видят половину снимка.
+    Возвращает версию выгруженного каталога.
+    """
+    version = catalog_version(cursor)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = connect(tmp_path)
+    try:
+        conn.executescript(CATALOG_SCHEMA)
+        conn.execute("CREATE TABLE snapshot_meta (key TEXT PRIMARY KEY, value TEXT)")
+        for table, columns in CATALOG_TABLES.items():
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+            insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                conn.executemany(insert, rows)
+        conn.executemany("INSERT INTO snapshot_meta (key, value) VALUES (?, ?)", [
+            ("version", version), ("exported_at", datetime.now().isoformat(" ", "seconds"))])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return version
+
+def snapshot_session(path=SNAPSHOT_PATH):
+    """
+    Возвращает фабрику курсоров (аналог db.db_session) для чтения снимка.
+    Вызывает RuntimeError, если снимок ещё не создан.
+    """
+    if not os.path.exists(path):
+        raise RuntimeError(f"Снимок каталога {path} не найден. Создайте его: python snapshot.py")
+    return session_factory(path, read_only=True)
+
+def catalog_factory():
+    """
+    Возвращает фабрику курсоров для чтения каталога: снимок в режиме READ_ONLY,
+    иначе — транзакции только для чтения в основной БД (db.read_session).
+    """
+    return snapshot_session() if READ_ONLY else read_session
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка каталога ReelDeal в снимок SQLite")
+    parser.add_argument("--path", default=SNAPSHOT_PATH, help="файл снимка")
+    parser.add_argument("--force", action="store_true", help="выгрузить, даже если каталог не изменился")
+    args = parser.parse_args()
+
+    with db_session() as cursor:
+        info = read_snapshot_info(args.path)
+        if not args.force and info is not None and info.get("version") == catalog_version(cursor):
+            print(f"Снимок {args.path} актуален (версия {info['version']}, выгружен {info['exported_at']})")
+            return
+        version = export_snapshot(cursor, args.path)
+    print(f"Каталог выгружен в {args.path} (версия {version})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Работа с файлом SQLite через тот же интерфейс, что и у курсора mysql.connector.
+# to_sqlite переводит SQL из Repository (диалект MySQL) в диалект SQLite, включая
+# DDL таблиц логов, поэтому Repository без изменений работает со встроенной базой
+# (хранилище "sqlite" в DB_CONFIG, см. db.get_backend), читает снимок каталога
+# (snapshot.py) и сгенерированную базу бенчмарка (bench.py).
+
+import contextlib
+import re
+import sqlite3
+from datetime import date, datetime
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+_translated = {}
+BUSY_TIMEOUT_MS = 5000  # Сколько ждать блокировку файла другим соединением
+
+def to_sqlite(sql):
+    """
+    Переводит SQL из Repository (диалект MySQL) в диалект SQLite.
+    """
+    result = _translated.get(sql)
+    if result is None:
+        result = sql.replace("%s", "?")
+        if result.startswith("EXPLAIN "):
+            result = "EXPLAIN QUERY PLAN " + result[len("EXPLAIN "):]
+        result = result.replace("INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+        result = re.sub(r",\s*KEY \w+ \([^)]*\)", "", result)
+        result = result.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ")
+        result = re.sub(r"\((?P<columns>[\w\s,]+)\)(?P<values>\s*VALUES\s*\([^)]*\)\s*)"
+                        r"ON DUPLICATE KEY UPDATE (?P<column>\w+) = (?P=column) \+ VALUES\((?P=column)\)",
+                        _upsert, result)
+        _translated[sql] = result
+    return result
+
+def _upsert(match):
+    """
+    ON DUPLICATE KEY UPDATE счётчика -> ON CONFLICT (...) DO UPDATE.
+    Ключ конфликта — остальные столбцы INSERT (первичный ключ таблиц счётчиков):
+    SQLite до 3.35 не принимает ON CONFLICT без списка столбцов.
+    """
+    column = match.group("column")
+    target = ", ".join(name.strip() for name in match.group("columns").split(",") if name.strip() != column)
+    return (f"({match.group('columns')}){match.group('values')}"
+            f"ON CONFLICT ({target}) DO UPDATE SET {column} = {column} + excluded.{column}")
+
+class SQLiteCursor:
+    """
+    Курсор SQLite с интерфейсом курсора mysql.connector (плейсхолдеры %s).
+    Считает прочитанные строки в rows_fetched.
+    """
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+        self.rows_fetched = 0
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(to_sqlite(sql), tuple(params))
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(to_sqlite(sql), [tuple(params) for params in seq_of_params])
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self.rows_fetched += len(rows)
+        return rows
+
+    def fetchmany(self, size):
+        rows = self._cursor.fetchmany(size)
+        self.rows_fetched += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self.rows_fetched += 1
+        return row
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+def connect(path, read_only=False):
+    """
+    Открывает файл SQLite с функциями, которых нет в SQLite, но которые использует Repository.
+    read_only=True открывает файл только для чтения.
+    """
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+    conn.create_function("CONCAT", -1, lambda *parts: "".join("" if p is None else str(p) for p in parts))
+    return conn
+
+def session_factory(path, read_only=False):
+    """
+    Возвращает аналог db.db_session для файла SQLite.
+    """
+    @contextlib.contextmanager
+    def session():
+        conn = connect(path, read_only)
+        cursor = SQLiteCursor(conn)
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    return session
+
+class SQLiteBackend:
+    """
+    Встроенное хранилище SQLite для пула соединений (db.ConnectionPool).
+    Аргументы конструктора:
+        config: dict — DB_CONFIG (path — файл базы, read_only — только чтение)
+    """
+    name = "sqlite"
+    Error = sqlite3.Error
+
+    def __init__(self, config):
+        self.path = config["path"]
+        self.read_only = config.get("read_only", False)
+
+    def connect(self):
+        conn = connect(self.path, self.read_only)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if not self.read_only:
+            conn.execute("PRAGMA journal_mode = WAL")  # Читатели не ждут запись логов
+        return conn
+
+    def cursor(self, conn):
+        return SQLiteCursor(conn)
+
+    def begin_read_only(self, conn):
+        conn.execute("BEGIN")  # В режиме WAL снимок фиксируется первым чтением
+
+    def ping(self, conn):
+        conn.execute("SELECT 1")
@@ -0,0 +1,61 @@
+# Топы команд и поисковых запросов.
+# TopCounter держит в памяти снимок топа из таблиц счётчиков (см. Repository.create_stats_tables)
+# и досчитывает к нему команды текущего процесса, поэтому top_queries
+# не зависит от объёма логов и не ходит в БД на каждый вызов.
+
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+TOP_TTL = 60  # Через сколько секунд снимок топа перечитывается из БД
+TOP_DEPTH = 100  # Сколько позиций топа загружать из БД
+TOP_PERIODS = {  # Период -> (количество дней, подпись)
+    'day': (1, 'за сутки'),
+    'week': (7, 'за неделю'),
+}
+
+class TopCounter:
+    """
+    Top-K по счётчикам в памяти.
+    Аргументы конструктора:
+        load: функция (limit, since) -> [(текст, количество)],
+            например Repository.get_top_commands
+        depth: int — сколько позиций загружать из БД
+        ttl: float — время жизни снимка в секундах
+    """
+    def __init__(self, load, depth=TOP_DEPTH, ttl=TOP_TTL):
+        self.load = load
+        self.depth = depth
+        self.ttl = ttl
+        self._snapshots = {}  # период -> (время загрузки, Counter)
+        self._lock = threading.Lock()  # Счётчик общий для всех сессий сервера
+        # Перечитывает топ один поток: load берёт своё соединение из пула, пока сессия держит своё
+        self._load_lock = threading.Lock()
+
+    def add(self, text):
+        """
+        Учитывает новую запись во всех загруженных снимках.
+        """
+        with self._lock:
+            for _, counts in self._snapshots.values():
+                counts[text] += 1
+
+    def top(self, limit, period=None):
+        """
+        Возвращает топ [(текст, количество)] за период (None — за всё время, иначе ключ TOP_PERIODS).
+        """
+        snapshot = self._snapshots.get(period)
+        if snapshot is None or time.monotonic() - snapshot[0] > self.ttl:
+            with self._load_lock:
+                snapshot = self._snapshots.get(period)
+                if snapshot is None or time.monotonic() - snapshot[0] > self.ttl:
+                    since = None
+                    if period is not None:
+                        since = date.today() - timedelta(days=TOP_PERIODS[period][0] - 1)
+                    snapshot = (time.monotonic(), Counter(dict(self.load(self.depth, since))))
+                    with self._lock:
+                        self._snapshots[period] = snapshot
+        with self._lock:
+            return heapq.nlargest(limit, snapshot[1].items(), key=lambda item: item[1])
@@ -31,9 +31,13 @@ def show_help():
     categories — Список жанров
     actors — Топ актёров
     search <слово> — Поиск фильмов
-    filter <жанр> <актёр> <год> — Фильтрация
-    top_queries — Популярные запросы
-    random — Случайный фильм
+    search -d <слово> — Поиск по названию и описанию
+    filter <жанр> <актёр> <год> — Фильтрация (несколько через запятую, годы: 2005-2007, _ — любой)
+    refine genre|year|title|actor <значение> — Уточнить текущий список фильмов (без запроса к БД)
+    refine sort title|-title|year|-year — Отсортировать текущий список
+    top_queries [day|week] — Популярные запросы
+    query_stats [reset] — Статистика запросов к БД и кэша результатов
+    random [N] [жанр] [год] — Случайный фильм (или N фильмов, не больше 15)
     next — Следующая страница
     prev — Предыдущая страница
     back — Назад
@@ -41,6 +45,12 @@ def show_help():
     exit — Выход
     """)
 
+def show_snapshot_info(info):
+    """
+    Сообщает, что каталог читается из снимка (режим только для чтения).
+    """
+    print(f"Режим только для чтения: каталог из снимка от {info.get('exported_at')} (версия {info.get('version')})")
+
 def show_error(message):
     """
     Выводит сообщение об ошибке.
@@ -101,7 +111,7 @@ def show_search_results(films, page_info=None, section="поиск"):
         return
     print(f"\nРезультаты (раздел: {section}):")
     for i, film in enumerate(films, start=1):
-        print(f"{i}. {film.title} ({film.year}, жанр: {film.genre}) — {film.get_short_description()}")
+        print(f"{i}. {film.title} ({film.year}, жанр: {', '.join(film.genre)}) — {film.get_short_description()}")
     if page_info:
         print(page_info)
     print("\nВведите номер фильма, next, prev или команду (back | home | help | exit)")
@@ -113,27 +123,66 @@ def show_film_details(film, actors):
         film: объект Film
         actors: список объектов Actor
     """
-    print(f"\nФильм: {film.title} ({film.year}, жанр: {film.genre})")
+    print(f"\nФильм: {film.title} ({film.year}, жанр: {', '.join(film.genre)})")
     print(f"Описание: {film.description}")
     print("\nАктёры:")
     for idx, actor in enumerate(actors, start=1):
         print(f"{idx}. {actor.full_name()}")
     print("\nВведите номер актёра, имя, или команду (back | home | help | exit)")
 
-def show_top_queries(queries, page_info=None):
+def show_top_queries(queries, page_info=None, period=None):
     """
     Показывает самые популярные команды или поисковые запросы.
     Аргументы:
         queries: список кортежей (command, count)
         page_info: строка с информацией о странице
+        period: подпись периода (например, "за неделю"), None — за всё время
     """
-    print("\nСамые популярные команды:")
+    print(f"\nСамые популярные команды{' ' + period if period else ''}:")
     for i, (command, count) in enumerate(queries, start=1):
         print(f"{i}. {command} — {count} раз")
     if page_info:
         print(page_info)
     print("\nВведите номер, next, prev или команду (back | home | help | exit)")
 
+def show_query_stats(entries, limit=15):
+    """
+    Показывает сводку по запросам к БД (самые затратные по суммарному времени).
+    Аргументы:
+        entries: список словарей из QueryStats.summary()
+        limit: сколько строк показать
+    """
+    if not entries:
+        print("Запросов пока не было.")
+        return
+    print("\nЗапросы к БД (по суммарному времени):")
+    print(f"{'метод':<26} {'раз':>5} {'всего, мс':>10} {'макс, мс':>9} {'строк':>7} {'КиБ':>7} {'медл.':>5}")
+    for entry in entries[:limit]:
+        print(f"{entry['method']:<26} {entry['count']:>5} {entry['total_ms']:>10.1f} "
+              f"{entry['max_ms']:>9.1f} {entry['rows']:>7} {entry['bytes'] / 1024:>7.1f} {entry['slow']:>5}")
+        print(f"    {entry['sql'][:100]}")
+
+def show_cache_stats(stats):
+    """
+    Показывает счётчики кэша результатов (см. cache.ResultCache.stats).
+    """
+    if not stats["enabled"]:
+        print("\nКэш результатов выключен.")
+        return
+    print(f"\nКэш результатов: попаданий {stats['hits']}, промахов {stats['misses']} "
+          f"({stats['hit_rate']:.0%} попаданий), вытеснено {stats['evictions']}, "
+          f"сбросов по версии каталога {stats['invalidations']}")
+    print(f"    записей {stats['entries']}, строк {stats['rows']} из {stats['max_rows']}")
+
+def show_log_stats(stats):
+    """
+    Показывает, сколько записей журнала команд потеряно (см. logwriter.LogWriter.stats).
+    """
+    print(f"\nЖурнал команд: в очереди {stats['queued']}, отброшено при переполнении {stats['dropped']}, "
+          f"не записано из-за ошибок {stats['failed']}")
+    if stats["last_error"]:
+        print(f"    последняя ошибка записи: {stats['last_error']}")
+
 def show_exit_message():
     """
     Показывает финальное сообщение при выходе.